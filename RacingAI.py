@@ -1,8 +1,20 @@
 import pygame
 import sys
-import csv
 import os
 import math
+import time
+
+from terrain import (
+    TERRAIN_GRASS, TERRAIN_WALL,
+    cast_lidar, compile_terrain, distance_field, fan_offsets, tile_class_maps,
+    trace_lidar,
+)
+from collisions import find_car_collisions
+from integrators import EULER, STEPPERS
+from trackfile import TrackData, find_track_file, read_track, write_track
+from trackcache import default_cache
+from walls import WallGeometry
+import profiler
 
 # from ai import AIController
 
@@ -17,7 +29,8 @@ default_font = None
 
 # directory where your ‘assets’ folder lives (next to RacingAI.py)
 ASSETS_DIR = os.path.join(os.path.dirname(__file__), 'assets')
-_sheet_raw = pygame.image.load(os.path.join(ASSETS_DIR, 'TrackPieces.png'))
+TRACK_SHEET_PATH = os.path.join(ASSETS_DIR, 'TrackPieces.png')
+_sheet_raw = pygame.image.load(TRACK_SHEET_PATH)
 
 TRACK_DIR = os.path.join(os.path.dirname(__file__), 'tracks')
 
@@ -38,11 +51,8 @@ road_tiles = None
 _car_raw       = pygame.image.load(os.path.join(ASSETS_DIR, 'CarSprite.png'))
 CAR_IMAGE_RAW = None
 
-# Terrain‐sensor colors
-GRASS_COLOR    = (  0,200,  0)   # off‐road grass
-SAND_COLOR     = (255,255,  0)   # yellow = sand
-GRAVEL_COLOR   = (  0,  0,  0)   # black = gravel
-CURB_BLUE_COLOR= (  0,  0,255)   # blue = slight curb
+# per-tile terrain classes, sliced from the raw sheet on first use
+_tile_maps = None
 
 # Friction multipliers relative to your normal rolling‐resistance
 Crr_NORMAL_MULT = 1.0
@@ -51,6 +61,85 @@ Crr_GRASS_MULT  = 3.0
 Crr_GRAVEL_MULT = 5.0
 Crr_SAND_MULT   = 8.0
 
+# how Car.update / CarFleet.step integrate the bicycle model: 'euler',
+# 'arc' or 'rk4' (see integrators.py)
+INTEGRATOR = EULER
+
+# drive_car's game loop: physics steps at a fixed rate and frames are drawn
+# at RENDER_FPS, with car poses interpolated between the last two steps
+RENDER_FPS       = 60
+PHYSICS_HZ       = 120         # controller / car-car collision rate
+MAX_STEP_MOVE    = 0.05        # within a step, each car sub-steps so it moves ≤ this × block size at a time
+MAX_FRAME_TIME   = 0.25        # longer frames (window drags, hitches) count as this long
+PHYSICS_BUDGET   = 0.75 / RENDER_FPS   # wall time per frame physics may use before it falls behind
+MAX_AI_CARS      = 500         # AI players drive_car will start
+
+def load_assets(convert=True):
+    """
+    Slices TrackPieces.png into `road_tiles` and loads the default car sprite.
+    Pass convert=False when no display is open (headless training); the raw
+    surfaces draw the same, just a little slower.
+    """
+    global road_tiles, CAR_IMAGE_RAW
+    _tile_cache.clear()
+    sheet = _sheet_raw.convert_alpha() if convert else _sheet_raw
+    road_tiles = [
+        sheet.subsurface(pygame.Rect(col * tile_w, row * tile_h, tile_w, tile_h)).copy()
+        for row in range(3) for col in range(3)
+    ]
+    CAR_IMAGE_RAW = _car_raw.convert_alpha() if convert else _car_raw
+
+# scaled + rotated road tiles, keyed by (tile index, rotation, size)
+_tile_cache = {}
+
+def get_tile_sprite(idx, rot, size):
+    """
+    road_tiles[idx] scaled to size×size, then rotated by `rot` degrees.
+    Built on first request and shared by Track.draw and Grid.draw, so each
+    of the 9 tiles is transformed once per rotation and block size.
+    """
+    key = (idx, rot, size)
+    tile = _tile_cache.get(key)
+    if tile is None:
+        tile = pygame.transform.scale(road_tiles[idx], (size, size))
+        if rot:
+            tile = pygame.transform.rotate(tile, rot)
+        _tile_cache[key] = tile
+    return tile
+
+# degrees between the pre-rotated frames of a car sprite
+CAR_ANGLE_STEP = 2
+
+class CarSpriteAtlas:
+    """
+    One car sprite pre-scaled to the car's size, with rotated frames every
+    `step` degrees. Frames are rotated on first use and then reused, so
+    drawing a car is a table lookup and a blit.
+    """
+    def __init__(self, sprite, width, height, step=CAR_ANGLE_STEP):
+        self.base   = pygame.transform.scale(sprite, (width, height))
+        n           = max(1, round(360 / step))
+        self.step   = 360 / n
+        self.frames = [None] * n
+
+    def frame(self, angle):
+        """The frame closest to `angle` degrees (counter-clockwise)."""
+        i = round(angle / self.step) % len(self.frames)
+        frame = self.frames[i]
+        if frame is None:
+            frame = self.frames[i] = pygame.transform.rotate(self.base, i * self.step)
+        return frame
+
+# atlases shared by every car using the same sprite at the same size
+_car_atlases = {}
+
+def get_car_atlas(sprite, width, height, step=CAR_ANGLE_STEP):
+    key = (sprite, width, height, step)
+    atlas = _car_atlases.get(key)
+    if atlas is None:
+        atlas = _car_atlases[key] = CarSpriteAtlas(sprite, width, height, step)
+    return atlas
+
 def get_text_input(screen, prompt, font, box_rect, text_color=(255,255,255), box_color=(0,0,0), border_color=(255,255,255), border_width=2):
     """
     Pops up a text-entry box over `screen`, returns the entered string when Enter is pressed.
@@ -142,10 +231,13 @@ class Grid:
                     else:
                         surf, rot = block, 0
 
-                    # scale then rotate around center
-                    tile = pygame.transform.scale(surf, (self.cell_size, self.cell_size))
-                    if rot:
-                        tile = pygame.transform.rotate(tile, rot)
+                    # scale then rotate around center (cached for palette tiles)
+                    if surf in road_tiles:
+                        tile = get_tile_sprite(road_tiles.index(surf), rot, self.cell_size)
+                    else:
+                        tile = pygame.transform.scale(surf, (self.cell_size, self.cell_size))
+                        if rot:
+                            tile = pygame.transform.rotate(tile, rot)
 
                     # center the rotated tile in the cell
                     blit_rect = tile.get_rect(center=(
@@ -176,15 +268,11 @@ class TrackEditor:
         self.selected_rotation = 0   # current rotation in degrees
 
 
-        # after loading asset_images, add:
-        sheet = pygame.image.load(os.path.join(ASSETS_DIR, 'TrackPieces.png')).convert_alpha()
-        tile_w = sheet.get_width() // 3
-        tile_h = sheet.get_height() // 3
-
         # indices: 0=no walls, 1=one wall, 2=opposite walls,
         # 3=adjacent walls, 4=90° curve, 5=45° curve
-        road_tiles = [sheet.subsurface(pygame.Rect(col*tile_w, row*tile_h, tile_w, tile_h)).copy()
-                    for row in range(3) for col in range(3)]
+        # (the module's road_tiles, so Grid.draw can use the tile cache)
+        if road_tiles is None:
+            load_assets()
     
         """
         self.blocks = [
@@ -441,65 +529,40 @@ class TrackEditor:
         box = pygame.Rect(self.screen.get_width()//2 - 150, self.screen.get_height()//2 - 20, 300, 40)
         file_name = get_text_input(self.screen, "Enter file name: ", default_font, box)
         file_name = os.path.join((TRACK_DIR), file_name)
-        with open(file_name + '.csv', 'w', newline='') as file:
-            writer = csv.writer(file)
-            # Write the grid size as the first row
-            writer.writerow([self.grid_size])
-
-            if self.spawn_point:
-                x, y = self.spawn_point
-                writer.writerow(['spawn', x, y])
-
-            if len(self.finish_line) == 2:
-                x1, y1 = self.finish_line[0]
-                x2, y2 = self.finish_line[1]
-                writer.writerow(['finish', x1, y1, x2, y2])
-
-            for (x1,y1),(x2,y2) in self.checkpoint_lines:
-                writer.writerow(['checkpoint', x1, y1, x2, y2])
-
-            # ... then your existing loop that writes each block row ...
-
-            for y in range(self.grid_size):
-                for x in range(self.grid_size):
-                    block = self.grid.get_block(x, y)
-                    if block:
-                        surf, rot = block                      # unpack Surface & rotation
-                        idx     = self.blocks.index(surf)      # find its palette index
-                        writer.writerow([x, y, idx, rot])
+        # plain names save as CSV; end the name in .trk for the binary format
+        if not file_name.endswith('.trk'):
+            file_name += '.csv'
+
+        data = TrackData(self.grid_size,
+                         spawn_point=self.spawn_point,
+                         finish_line=self.finish_line,
+                         checkpoint_lines=self.checkpoint_lines)
+        for y in range(self.grid_size):
+            for x in range(self.grid_size):
+                block = self.grid.get_block(x, y)
+                if block:
+                    surf, rot = block                      # unpack Surface & rotation
+                    idx     = self.blocks.index(surf)      # find its palette index
+                    data.blocks.append((x, y, idx, rot))
+        write_track(file_name, data)
 
     def load_track(self):
         #file_name = input("Enter file name: ")
         box = pygame.Rect(self.screen.get_width()//2 - 150, self.screen.get_height()//2 - 20, 300, 40)
         file_name = get_text_input(self.screen, "Enter file name: ", default_font, box)
-        file_name = os.path.join((TRACK_DIR), file_name)
-        if os.path.exists(file_name + '.csv'):
-            with open(file_name + '.csv', 'r') as file:
-                reader = csv.reader(file)
-                # reset metadata
-                self.spawn_point = None
-                self.finish_line = []
-                self.checkpoints = []
-
-                # first row: grid size
-                self.grid_size = int(next(reader)[0])
-                self.init_grid()
-
-                for row in reader:
-                    tag = row[0]
-                    if tag == 'spawn':
-                        self.spawn_point = (int(row[1]), int(row[2]))
-                    elif tag == 'finish':
-                        x1, y1, x2, y2 = map(int, row[1:])
-                        self.finish_line = [(x1, y1), (x2, y2)]
-                    elif tag == 'checkpoint':
-                        x1,y1,x2,y2 = map(int, row[1:])
-                        self.checkpoint_lines.append(((x1,y1),(x2,y2)))
-                    else:
-                        x, y, idx, rot = map(int, row)
-                        surf = self.blocks[idx]
-                        self.grid.place_block(x, y, surf, rot)
-
+        file_name = find_track_file(os.path.join((TRACK_DIR), file_name))
+        if os.path.exists(file_name):
+            data = read_track(file_name)
+            self.grid_size = data.grid_size
+            self.init_grid()
+
+            # replace the metadata
+            self.spawn_point      = data.spawn_point
+            self.finish_line      = data.finish_line
+            self.checkpoint_lines = data.checkpoint_lines
+            for x, y, idx, rot in data.blocks:
+                surf = self.blocks[idx]
+                self.grid.place_block(x, y, surf, rot)
 
             return self.grid  # Return the loaded grid
         else:
@@ -553,6 +616,8 @@ class Car:
         # for collision rollback
         self.prev_x, self.prev_y, self.prev_yaw = x, y, self.yaw
 
+        self.integrator = INTEGRATOR
+
             # in Car.__init__:
         self.reverse_delay  = 0.2   # seconds to wait at zero before reversing
         self.time_since_stop = 0.0  # timer accumulator
@@ -589,56 +654,42 @@ class Car:
         # save previous in case we need to roll back on collision
         self.prev_x, self.prev_y, self.prev_yaw = self.x, self.y, self.yaw
 
-        # 1) Longitudinal forces
-        # throttle produces forward force, brake_input produces backward force
-        F_drive = self.throttle * self.max_engine_force  
-        F_brake = self.brake_input * self.max_brake_force  
-        # aerodynamic drag & rolling resistance
-        F_drag = -self.Cd * self.velocity * abs(self.velocity)
-        F_rr   = -self.Crr * self.velocity
-
-        # net longitudinal acceleration
-        a_long = (F_drive + F_brake + F_drag + F_rr) / self.mass
-        # integrate velocity
-        self.velocity += a_long * dt
-
-        # 2) Update steering angle toward target
-        # (you’ll set self.steer_target via input, see next section)
-        steer_diff = self.steer_target - self.steer
-        max_delta = self.steer_speed * dt
-        # clamp how fast wheels turn
-        steer_diff = max(-max_delta, min(steer_diff, max_delta))
-        self.steer += steer_diff
-
-        # 3) Kinematic bicycle motion
-        if abs(self.steer) > 1e-4:
-            turn_radius = self.wheel_base / math.tan(self.steer)
-            angular_velocity = self.velocity / turn_radius
-        else:
-            angular_velocity = 0.0
-
-        # integrate position & heading
-        self.yaw -= angular_velocity * dt
-        self.x += self.velocity * math.cos(self.yaw) * dt
-        self.y += self.velocity * math.sin(self.yaw) * dt
+        # longitudinal forces, steering toward steer_target and the
+        # kinematic bicycle motion; see integrators.py for each method
+        state = STEPPERS[self.integrator](
+            self, self.x, self.y, self.yaw, self.velocity, self.steer,
+            self.throttle, self.brake_input, self.Crr, self.steer_target, dt)
+        self.x, self.y, self.yaw, self.velocity, self.steer = map(float, state)
 
         # keep your public-facing angle in degrees (for drawing)
         self.angle = -math.degrees(self.yaw)
 
 
-    def draw(self, screen):
+    def draw(self, screen, alpha=1.0):
+        # `alpha` blends from the pose before the last update (0) to the
+        # current one (1), for drawing between fixed physics steps
+        x   = self.prev_x   + (self.x   - self.prev_x)   * alpha
+        y   = self.prev_y   + (self.y   - self.prev_y)   * alpha
+        yaw = self.prev_yaw + (self.yaw - self.prev_yaw) * alpha
+
         # choose a per‐car sprite if assigned, else fallback
         base_sprite = getattr(self, 'sprite_raw', CAR_IMAGE_RAW)
-        # scale it to the car’s logical size
-        sprite = pygame.transform.scale(
-            base_sprite,
-            (int(self.width), int(self.height))
-        )
+        # scaled to the car’s logical size and pre-rotated, shared per sprite
+        atlas   = get_car_atlas(base_sprite, int(self.width), int(self.height))
         # rotate around center
-        rotated = pygame.transform.rotate(sprite, self.angle)
-        rect    = rotated.get_rect(center=(self.x, self.y))
+        rotated = atlas.frame(-math.degrees(yaw))
+        rect    = rotated.get_rect(center=(x, y))
         screen.blit(rotated, rect.topleft)
 
+    def substeps_for(self, dt, max_move):
+        """
+        How many equal sub-steps of `dt` keep this car from moving more
+        than `max_move` pixels in any one, even at full throttle or brake.
+        """
+        max_accel = max(self.max_engine_force, -self.max_brake_force) / self.mass
+        reach = (abs(self.velocity) + max_accel * dt) * dt
+        return max(1, math.ceil(reach / max_move))
+
     def handle_collision(self):
         # go back to last good state and stop
         self.x, self.y, self.yaw = self.prev_x, self.prev_y, self.prev_yaw
@@ -646,47 +697,41 @@ class Car:
         # keep public angle in sync
         self.angle = -math.degrees(self.yaw)
 
-    def get_lidar(self, surface, num_rays=5, fov=math.pi, max_dist=None, step=4):
+    def get_lidar(self, terrain, num_rays=5, fov=math.pi, max_dist=None, step=4,
+                  field=None, walls=None):
         """
         Cast `num_rays` rays in a fan of width `fov` (radians) centered on
-        the car's heading, sampling every `step` pixels up to `max_dist`.
+        the car's heading over the compiled `terrain` map (Track.terrain),
+        up to `max_dist`. By default they are sampled every `step` pixels.
+        With a distance `field` (Track.distance_field) they are traced
+        exactly to the first obstacle pixel (see terrain.trace_lidar) and
+        `step` is ignored. With `walls` (Track.walls) they are intersected
+        with the wall segments instead, to sub-pixel accuracy.
         Returns a list of normalized distances [0..1].
+        For many cars at once use terrain.trace_lidar / cast_lidar instead.
         """
-        import math
-
         # set a default max_dist if none provided
         if max_dist is None:
             max_dist = self.width * 10  # e.g. ten car‐lengths
+        profiler.count('rays', num_rays)
 
-        readings = []
-        half = fov / 2
-        for i in range(num_rays):
-            # angle relative to car yaw
-            ray_ang = self.yaw + (-half + fov * i / (num_rays - 1))
-            dist = 0
-            hit = False
-
-            # march along the ray
-            while dist < max_dist:
-                x = int(self.x + dist * math.cos(ray_ang))
-                y = int(self.y + dist * math.sin(ray_ang))
-                # stop if we go off‐screen
-                if not (0 <= x < surface.get_width() and 0 <= y < surface.get_height()):
-                    break
-                color = surface.get_at((x, y))[:3]
-                # treat grass or wall as an obstacle
-                if color == (0, 200, 0) or color == (255, 0, 0):
-                    hit = True
-                    break
-                dist += step
-
-            # clamp & normalize
-            readings.append(min(dist, max_dist) / max_dist)
-        return readings
+        if walls is not None:
+            readings = walls.cast([self.x], [self.y], [self.yaw],
+                                  fan_offsets(num_rays, fov), max_dist)
+            return readings[0].tolist()
+
+        if field is None:
+            readings = cast_lidar(terrain, [self.x], [self.y], [self.yaw],
+                                  num_rays, fov, max_dist, step)
+            return readings[0].tolist()
+
+        readings = trace_lidar(terrain, field, [self.x], [self.y], [self.yaw],
+                               num_rays, fov, max_dist)
+        return readings[0].tolist()
 
 
 class Track:
-    def __init__(self, name):
+    def __init__(self, name, build_terrain=True, cache=default_cache):
         self.name = name
         self.blocks = []
         self.spawn_point   = None
@@ -695,53 +740,55 @@ class Track:
         self.block_size = 0
         self.screen_size = 800  # We'll use a square screen
         self.checkpoint_lines = []
-
-        self.load_track()
-
-    def load_track(self):
+        self.checkpoint_pixels = []  # the same segments in pixels, see compute_checkpoint_pixels
+        self.finish_pixels     = None
+        self.terrain = None     # [y, x] uint8 terrain classes, see terrain.py
+        self.distance_field = None  # [y, x] pixels to the nearest grass/wall
+        self.walls = None           # WallGeometry, the walls as segments
+        self._static_layer = None   # (font, Surface) cached by get_static_layer
+        self.cache = cache          # TrackCache for derived data, or None
+        self.cache_key = None       # set by load_track
+
+        self.load_track(build_terrain)
+
+    def load_track(self, build_terrain=True):
+        """
+        Reads tracks/<name>.csv or .trk (see trackfile.py). With
+        build_terrain=False the terrain map and distance field are left for the
+        caller to supply (e.g. from shared memory in a worker process).
+        """
         try:
-            file_name = f"{self.name}.csv" if not self.name.endswith('.csv') else self.name
             # full_path = os.path.abspath(file_name)
-            full_path = os.path.join((TRACK_DIR), file_name)
+            full_path = find_track_file(os.path.join((TRACK_DIR), self.name))
+            file_name = os.path.basename(full_path)
             print(f"Attempting to load track from: {full_path}")
 
             if not os.path.exists(full_path):
                 print(f"File not found: {full_path}")
                 return
 
-            with open(full_path, 'r') as file:
-                reader = csv.reader(file)
-
-                # --- NEW: grab grid size from the very first row ---
-                first_row = next(reader)
-                self.grid_size  = int(first_row[0])
-                self.block_size = self.screen_size // self.grid_size
-
-                # now clear and init all your lists
-                self.blocks      = []
-                self.spawn_point = None
-                self.finish_line = []
-                self.checkpoints_lines = []
-
-                # existing loop over the rest of the rows
-                for row in reader:
-                    tag = row[0]
-                    if tag == 'spawn':
-                        self.spawn_point = (int(row[1]), int(row[2]))
-                    elif tag == 'finish':
-                        x1, y1, x2, y2 = map(int, row[1:])
-                        self.finish_line = [(x1, y1), (x2, y2)]
-                    elif tag == 'checkpoint':
-                        # —or— if you moved to line‐based checkpoints:
-                        x1, y1, x2, y2 = map(int, row[1:])
-                        self.checkpoint_lines.append([[x1,y1],[x2,y2]])
-                    else:
-                        x, y, idx, rot = map(int, row)
-                        self.blocks.append((x, y, idx, rot))
+            data = read_track(full_path)
+            self.grid_size  = data.grid_size
+            self.block_size = self.screen_size // self.grid_size
+
+            self.invalidate_render_cache()
+            self.blocks      = data.blocks
+            self.spawn_point = data.spawn_point
+            self.finish_line = data.finish_line
+            self.checkpoint_lines = [[list(p1), list(p2)]
+                                     for p1, p2 in data.checkpoint_lines]
+            self.compute_checkpoint_pixels()
+            if self.cache is not None:
+                self.cache_key = self.cache.key(
+                    [full_path, TRACK_SHEET_PATH],
+                    block_size=self.block_size, screen_size=self.screen_size)
 
             print(f"Successfully loaded track '{file_name}' with {len(self.blocks)} blocks")
             print(f"Grid size: {self.grid_size}, Block size: {self.block_size}")
 
+            if build_terrain:
+                self.compile_terrain()
+
         except FileNotFoundError:
             print(f"Track file '{file_name}' not found.")
         except Exception as e:
@@ -753,26 +800,16 @@ class Track:
         screen.fill((0, 200, 0))  # Green color
         
         for x, y, idx, rot in self.blocks:
-            # 1) pull the original sprite
-            tile = road_tiles[idx]
-
-            # 2) scale it down to your block size
-            tile = pygame.transform.scale(
-                tile,
-                (self.block_size, self.block_size)
-            )
+            # 1) the sprite scaled to the block size and rotated, from the cache
+            tile = get_tile_sprite(idx, rot, self.block_size)
 
-            # 3) then rotate (if rot ≠ 0)
-            if rot:
-                tile = pygame.transform.rotate(tile, rot)
-
-            # 4) compute its centered position in the grid cell
+            # 2) compute its centered position in the grid cell
             blit_rect = tile.get_rect(center=(
                 x * self.block_size + self.block_size/2,
                 y * self.block_size + self.block_size/2
             ))
 
-            # 5) draw it
+            # 3) draw it
             screen.blit(tile, blit_rect.topleft)
         
         # Draw grid lines for debugging
@@ -782,6 +819,112 @@ class Track:
           #  pygame.draw.line(screen, (0, 0, 0), (0, i * self.block_size), (self.screen_size, i * self.block_size))
             
 
+    def compute_checkpoint_pixels(self):
+        """
+        Converts the checkpoint and finish segments from grid cells to
+        pixel endpoints (cell centres) once, for RaceManager and friends:
+        checkpoint_pixels is a list of ((x1, y1), (x2, y2)), finish_pixels
+        one such pair or None.
+        """
+        bs = self.block_size
+        def to_pixels(cell):
+            return (cell[0]*bs + bs/2, cell[1]*bs + bs/2)
+
+        self.checkpoint_pixels = [(to_pixels(p1), to_pixels(p2))
+                                  for p1, p2 in self.checkpoint_lines]
+        self.finish_pixels = None
+        if len(self.finish_line) == 2:
+            self.finish_pixels = (to_pixels(self.finish_line[0]),
+                                  to_pixels(self.finish_line[1]))
+
+    def compile_terrain(self):
+        """
+        Builds self.terrain once from the blocks, their rotations and the
+        finish/checkpoint lines, plus its distance field for LIDAR and the
+        walls as segments. Sensors index these instead of a drawn surface.
+        """
+        def build_terrain():
+            global _tile_maps
+            if _tile_maps is None:
+                _tile_maps = tile_class_maps(_sheet_raw, tile_w, tile_h)
+            return compile_terrain(self, _tile_maps)
+
+        self.terrain = self._cached('terrain', build_terrain)
+        self.distance_field = self._cached(
+            'distance_field', lambda: distance_field(self.terrain))
+        self.walls = WallGeometry.from_track(self)
+        return self.terrain
+
+    def _cached(self, name, build):
+        """
+        build() through the on-disk track cache (see trackcache.py); cached
+        arrays come back read-only.
+        """
+        if self.cache is None or self.cache_key is None:
+            return build()
+        return self.cache.get(self.cache_key, name, build)
+
+    def render_static_layer(self, font=None):
+        """
+        Returns a new Surface with the track, finish line and checkpoint
+        segments drawn on it, the checkpoints numbered if a `font` is given.
+        Works without an open display.
+        """
+        # the unlabelled image comes from the track cache when possible
+        rgb = self._cached('static_layer', self._render_track_rgb)
+        surface = pygame.Surface(self.get_screen_size())
+        surface.blit(pygame.image.frombuffer(rgb.tobytes(), surface.get_size(), 'RGB'), (0, 0))
+
+        bs = self.block_size
+        if font is not None:
+            for idx, ((x1,y1),(x2,y2)) in enumerate(self.checkpoint_lines):
+                p1 = (x1*bs + bs//2, y1*bs + bs//2)
+                p2 = (x2*bs + bs//2, y2*bs + bs//2)
+                mx, my = (p1[0]+p2[0])//2, (p1[1]+p2[1])//2
+                lbl = font.render(str(idx+1), True, (0,0,0))
+                surface.blit(lbl, lbl.get_rect(center=(mx,my)))
+        return surface
+
+    def _render_track_rgb(self):
+        """
+        The track with its finish and checkpoint lines, as an [y, x, 3]
+        uint8 array (the form render_static_layer caches on disk).
+        """
+        surface = pygame.Surface(self.get_screen_size())
+        surface.fill((0, 200, 0))
+        self.draw(surface)
+
+        bs = self.block_size
+        if len(self.finish_line) == 2:
+            (x1, y1), (x2, y2) = self.finish_line
+            p1 = (x1*bs + bs//2, y1*bs + bs//2)
+            p2 = (x2*bs + bs//2, y2*bs + bs//2)
+            pygame.draw.line(surface, (255,255,255), p1, p2, max(1, bs//10))
+        for (cx1, cy1), (cx2, cy2) in self.checkpoint_lines:
+            q1 = (cx1*bs + bs//2, cy1*bs + bs//2)
+            q2 = (cx2*bs + bs//2, cy2*bs + bs//2)
+            pygame.draw.line(surface, (255,165,0), q1, q2, max(1, bs//10))
+        return pygame.surfarray.array3d(surface).transpose(1, 0, 2)
+
+    def get_static_layer(self, font=None):
+        """
+        Cached render_static_layer(font). The track never changes during a
+        race, so the layer is built once and handed out on every frame until
+        invalidate_render_cache() (called when the track is reloaded). Treat
+        the returned Surface as read-only.
+        """
+        if self._static_layer is None or self._static_layer[0] is not font:
+            surface = self.render_static_layer(font)
+            # match the display's pixel format for fast blits, if there is one
+            if pygame.display.get_surface() is not None:
+                surface = surface.convert()
+            self._static_layer = (font, surface)
+        return self._static_layer[1]
+
+    def invalidate_render_cache(self):
+        """Drops the cached static layer; call after changing the track."""
+        self._static_layer = None
+
     def get_car_size(self):
         # Make the car size proportional to the grid
         car_width = self.block_size * 0.5  # 50% of a block width
@@ -810,7 +953,6 @@ class CarCollisionDetector:
             ("rear_left_wheel",    (-0.4,  0.45)),
             ("rear_right_wheel",   ( 0.4,  0.45))
         ]
-        self.last_colors = {name: None for name, _ in self.listeners}
 
     def get_listener_positions(self):
         import math
@@ -834,90 +976,74 @@ class CarCollisionDetector:
         return positions
 
 
-    def update_colors(self, colors):
-        for name, color in colors.items():
-            if self.last_colors[name] is None:
-                self.last_colors[name] = (0, 0, 0)  # Initialize with black
-                continue
-            colorDifference = abs(color[0] - (self.last_colors[name])[0]) + abs(color[1] - (self.last_colors[name])[1]) + abs(color[2] - (self.last_colors[name])[2])
-            if colorDifference > 3:
-                #print(f"Listener '{name}' detected new color: {color}")
-                self.last_colors[name] = color
-    def update(self, colors):
-
-        for name, color in colors.items():
-            colorDifference = abs(color[0] - self.last_colors[name][0]) + abs(color[1] - self.last_colors[name][1]) + abs(color[2] - self.last_colors[name][2])
-            if colorDifference > 3:
-                #print(f"Listener '{name}' detected new color: {color}")
-                self.last_colors[name] = color
+    def sample(self, terrain):
+        """
+        Reads every listener from a compiled terrain map.
+        Returns {listener name: terrain class}, clamping to the map edges.
+        """
+        height, width = terrain.shape
+        classes = {}
+        for name, x, y in self.get_listener_positions():
+            x = max(0, min(x, width-1))
+            y = max(0, min(y, height-1))
+            classes[name] = int(terrain[y, x])
+        profiler.count('sensor_reads', len(classes))
+        return classes
 
     def draw_debug(self, screen):
         for _, x, y in self.get_listener_positions():
             pygame.draw.circle(screen, (255, 0, 0), (x, y), 2)
 
-    def check_collision(self, colors):
-        """
-        Returns True if *any* listener sees grass (RGB exactly (0,200,0)),
-        meaning we’ve left the road.
-        """
-        for name, color in colors.items():
-            if color[:3] == (0, 200, 0):
-                #print(f"Listener '{name}' detected grass color: {color}")
-                return True
-        return False
-    
-    def check_wall_collision(self, colors):
-        """
-        Returns True if any non-wheel listener (body) sees the wall color (255,0,0).
-        """
-        for name, col in colors.items():
-            if 'wheel' not in name and col[:3] == (255, 0, 0):
-                return True
-        return False
+class SimClock:
+    """
+    Simulation time in seconds. It only moves when advance() is called with
+    the physics timestep, so lap times don't depend on frame rate or machine
+    load and a headless run can go faster than real time.
+    """
+    def __init__(self):
+        self.time = 0.0
 
-    def any_wheel_offtrack(self, colors):
-        """
-        Returns True if any wheel listener sees grass (0,200,0).
-        """
-        for name, col in colors.items():
-            if 'wheel' in name and col[:3] == (0, 200, 0):
-                return True
-        return False
+    def advance(self, dt):
+        self.time += dt
+
+    def now(self):
+        return self.time
+
+class WallClock:
+    """Real time since pygame.init(), with the same now() as SimClock."""
+    def now(self):
+        return pygame.time.get_ticks() / 1000.0
 
 class RaceManager:
-    def __init__(self, track, font):
+    def __init__(self, track, font, clock=None):
         self.track            = track
         self.font             = font
+        # lap timing source: a SimClock, or the wall clock if none is given
+        self.clock            = clock if clock is not None else WallClock()
         self.lap_count        = 0
         self.lap_times        = []
         self.current_cp_idx   = 0
-        self.lap_start        = pygame.time.get_ticks() / 1000.0
-        self.lap_start      = pygame.time.get_ticks() / 1000.0
-        self.best_lap       = None
+        self.lap_start        = self.clock.now()
+        self.best_lap         = None
 
     def update(self, car):
         """Call this at each sub-step to catch fast crossings."""
-        bs   = self.track.block_size
+        checkpoints = self.track.checkpoint_pixels
         prev = (car.prev_x, car.prev_y)
         curr = (car.x, car.y)
 
         # 1) In-order checkpoint crossing
-        if self.current_cp_idx < len(self.track.checkpoint_lines):
-            x1,y1 = self.track.checkpoint_lines[self.current_cp_idx][0]
-            x2,y2 = self.track.checkpoint_lines[self.current_cp_idx][1]
-            p1 = (x1*bs + bs/2, y1*bs + bs/2)
-            p2 = (x2*bs + bs/2, y2*bs + bs/2)
+        if self.current_cp_idx < len(checkpoints):
+            p1, p2 = checkpoints[self.current_cp_idx]
             if self._crossed(prev, curr, p1, p2):
                 self.current_cp_idx += 1
                 print(f"Checkpoint {self.current_cp_idx} cleared")
 
         # 2) Only after *all* checkpoints, check finish-line for a lap
-        elif self.current_cp_idx == len(self.track.checkpoint_lines) and len(self.track.finish_line) == 2:
-            (f1x,f1y),(f2x,f2y) = self.track.finish_line
-            f1 = (f1x*bs + bs/2, f1y*bs + bs/2)
-            f2 = (f2x*bs + bs/2, f2y*bs + bs/2)
+        elif self.current_cp_idx == len(checkpoints) and self.track.finish_pixels is not None:
+            f1, f2 = self.track.finish_pixels
             if self._crossed(prev, curr, f1, f2):
-                now = pygame.time.get_ticks() / 1000.0
+                now = self.clock.now()
                 lap_duration = now - self.lap_start
                 # record exactly once
                 self.lap_times.append(lap_duration)
@@ -945,7 +1071,7 @@ class RaceManager:
         screen.blit(lap_surf, (x_off, y_off))
 
         # 2) Current lap timer
-        now   = pygame.time.get_ticks() / 1000.0
+        now   = self.clock.now()
         curr  = now - self.lap_start
         curr_surf = self.font.render(f"Current: {curr:.2f}s", True, (0,0,0))
         screen.blit(curr_surf, (x_off, y_off + line_h))
@@ -968,21 +1094,18 @@ class RaceManager:
          - otherwise, use the midpoint of the finish_line (if present).
         distance is in pixels; angle is radians ∈ [-π, π], relative to car.yaw.
         """
-        import math
-
         # pick segment
         idx = self.current_cp_idx
-        if idx < len(self.track.checkpoint_lines):
-            (x1,y1),(x2,y2) = self.track.checkpoint_lines[idx]
-        elif len(self.track.finish_line) == 2:
-            (x1,y1),(x2,y2) = self.track.finish_line
+        if idx < len(self.track.checkpoint_pixels):
+            (x1,y1),(x2,y2) = self.track.checkpoint_pixels[idx]
+        elif self.track.finish_pixels is not None:
+            (x1,y1),(x2,y2) = self.track.finish_pixels
         else:
             return 0.0, 0.0  # no objective
 
         # midpoint in world coords
-        bs = self.track.block_size
-        mx = (x1 + x2) * bs * 0.5 + bs * 0.5
-        my = (y1 + y2) * bs * 0.5 + bs * 0.5
+        mx = (x1 + x2) * 0.5
+        my = (y1 + y2) * 0.5
 
         # vector to midpoint
         dx = mx - car.x
@@ -1060,81 +1183,6 @@ class KeyboardController(Controller):
 
         return throttle, brake_input, steer_target
 
-class HeuristicController:
-    """
-    A rule-based controller that drives using LIDAR and checkpoint info.
-    """
-    def __init__(self, track: Track, manager: RaceManager, track_surface=None, car = None):
-        self.track = track
-        self.manager = manager
-        self.track_surface = track_surface
-        self.car = car
-        # LIDAR settings  
-        self.num_rays = 11
-        self.fov = math.pi * 1
-        self.max_dist = None  # will be set based on car width
-        self.step = 4
-        # Steering deadzone
-        self.dead_zone = 0.2
-
-    def get_actions(self, car: Car, keys=None, dt: float = 0.0):
-        if self.max_dist is None:
-            self.max_dist     = car.width * 10
-            self.block_thresh = 0.75
-            # crash threshold: if you get closer than this, back up
-            self.crash_thresh = 0.15
-
-        # 1) Sense environment
-        rays = car.get_lidar(
-            self.track_surface,
-            num_rays=self.num_rays,
-            fov=self.fov,
-            max_dist=self.max_dist,
-            step=self.step
-        )
-        center_idx   = self.num_rays // 2
-        forward_dist = rays[center_idx]
-
-        #for ray in rays:
-        #    print(f"Ray distance: {ray:.2f}")
-
-        # 2) Steering (unchanged)
-        dist_to_cp, ang_to_cp = self.manager.get_next_checkpoint_info(car)
-        left_clear  = sum(rays[:center_idx])
-        right_clear = sum(rays[center_idx+1:])
-
-        if forward_dist < self.block_thresh:
-            steer_cmd = -car.max_steer if right_clear > left_clear else car.max_steer
-        else:
-            desired = max(-car.max_steer, min(car.max_steer, ang_to_cp))
-            if abs(desired) < self.dead_zone:
-                steer_cmd = 0.0
-            elif desired > 0:
-                steer_cmd = desired if left_clear  >= self.block_thresh else -car.max_steer
-            else:
-                steer_cmd = desired if right_clear >= self.block_thresh else  car.max_steer
-
-        game_clock = pygame.time.Clock()
-
-        # 3) Throttle / Brake with instant reverse on “crash”
-        if (forward_dist < self.crash_thresh) or ((car.velocity == 0) and (game_clock.get_time() < 100)):
-            # we’re too close → back up
-            print("Collision detected! Reversing...")
-            throttle = -1.0
-            steer_cmd = -steer_cmd
-            brake    =  0.0
-        else:
-            # otherwise floor it whenever you can, else half‐speed
-            if forward_dist > self.block_thresh:
-                throttle = 1.0
-            else:
-                #print("Obstacle detected! Slowing down...")
-                throttle = 0.7
-            brake = 0.0
-
-        return throttle, brake, steer_cmd
-
-
 class Menu:
     def __init__(self, screen):
         self.screen = screen
@@ -1186,30 +1234,74 @@ def compute_spawns(spawn_cell, num, collide, track):
         # all cars stack on the spawn tile
         spawns = [(center_x, center_y)] * num
     else:
+        # two cars per block in opposite corners, the blocks running back
+        # from the spawn for as long as that stays on the track and then
+        # wrapping on to the rest of the track, nearest first. Once every
+        # block has two, each takes two more in its other corners.
         offset = bs * 0.25  # quarter‐block corner offset
-        for i in range(num):
-            layer  = i // 2      # 0 = inner row, 1 = one back, etc.
-            corner = i %  2      # 0 = +xy, 1 = -xy
-
-            # start with corner offset
-            dx =  offset if corner == 0 else -offset
-            dy =  offset if corner == 0 else -offset
-
-            # then push back by `layer` full blocks
-            behind = layer * bs * sign
-            if vertical:
-                dy += behind
-            else:
-                dx += behind
-
-            spawns.append((center_x + dx, center_y + dy))
+        cells  = _grid_cells(track, spawn_cell, vertical, sign)
+        for corners in (((offset, offset), (-offset, -offset)),
+                        ((offset, -offset), (-offset, offset))):
+            for gx, gy in cells:
+                for dx, dy in corners:
+                    x = gx * bs + bs/2 + dx
+                    y = gy * bs + bs/2 + dy
+                    if len(spawns) < num and _spawn_clear(track, x, y):
+                        spawns.append((x, y))
 
     return spawns
 
 
-def drive_car(screen, track_name):
-    #from rule_based_driver import HeuristicController
-
+def _grid_cells(track, spawn_cell, vertical, sign):
+    """
+    Track blocks in starting-grid order: straight back from `spawn_cell`
+    (along y if `vertical`, `sign` pointing away from the finish) until
+    that leaves the track, then every other block reachable from the
+    spawn, by distance along the track.
+    """
+    placed = {(x, y) for x, y, _, _ in track.blocks}
+    cells = []
+    cell = tuple(spawn_cell)
+    while cell in placed and cell not in cells:
+        cells.append(cell)
+        x, y = cell
+        cell = (x, y + sign) if vertical else (x + sign, y)
+
+    seen  = set(cells) | {tuple(spawn_cell)}
+    queue = [tuple(spawn_cell)]
+    for x, y in queue:
+        for n in ((x+1, y), (x-1, y), (x, y+1), (x, y-1)):
+            if n in placed and n not in seen:
+                seen.add(n)
+                queue.append(n)
+                cells.append(n)
+    return cells
+
+
+def _spawn_clear(track, x, y):
+    """True if a car starting at (x, y) has no sensor on grass or a wall."""
+    if track.terrain is None:
+        return True
+    car = Car(x, y, *track.get_car_size())
+    classes = car.collision_detector.sample(track.terrain)
+    return not any(cls in (TERRAIN_GRASS, TERRAIN_WALL) for cls in classes.values())
+
+
+def drive_car(screen, track_name, physics_hz=PHYSICS_HZ, collide_cars=True):
+    """
+    Races humans and AI cars on `track_name`. The game runs in fixed steps
+    of 1/physics_hz seconds, as many per frame as the elapsed time calls
+    for; cars are drawn interpolated between their last two states. If the
+    physics can't keep up, the backlog is dropped and the game slows down
+    rather than stalling further each frame.
+
+    Within a step each car is sub-stepped by its own speed (see
+    Car.substeps_for), so a fast car can't tunnel through a wall or skip a
+    checkpoint line while a parked one costs a single update.
+
+    With collide_cars=False the cars drive through each other and all
+    start on the spawn tile.
+    """
     track = Track(track_name)
     if not track.blocks:  # If no blocks were loaded, return to menu
         print("Failed to load track. Returning to menu.")
@@ -1219,13 +1311,12 @@ def drive_car(screen, track_name):
 
     screen_size = track.get_screen_size()
     screen = pygame.display.set_mode(screen_size)  # Resize the screen
-    
-    track_surface = pygame.Surface(screen_size)
-    track_surface.fill((0, 200, 0))
-    track.draw(track_surface)
 
     pygame.font.init()
     default_font = pygame.font.Font(None, 32)
+
+    # track + finish + numbered checkpoints, rendered once and reused
+    track_surface = track.get_static_layer(default_font)
     # ask how many cars
 
     # ask how many human players
@@ -1235,12 +1326,11 @@ def drive_car(screen, track_name):
 
     # ask how many AI players
     box = pygame.Rect(screen.get_width()//2-150, screen.get_height()//2-20, 300, 40)
-    ai_count = int(get_text_input(screen, "AI players (0–50):    ", default_font, box))
-    ai_count = max(0, min(ai_count, 50))
+    ai_count = int(get_text_input(screen, f"AI players (0–{MAX_AI_CARS}):   ", default_font, box))
+    ai_count = max(0, min(ai_count, MAX_AI_CARS))
 
-    # total cars and collision flag
+    # total cars
     num_cars    = human_count + ai_count
-    collide_cars = True  # or prompt separately if you like
     
     car_width, car_height = track.get_car_size()
 
@@ -1259,9 +1349,16 @@ def drive_car(screen, track_name):
 
     # New Spawn Point Code
     spawns = compute_spawns(track.spawn_point, num_cars, collide_cars, track)
+    if len(spawns) < num_cars:
+        # the starting grid is full: race with the AI cars that fit
+        print(f"Only room for {len(spawns)} cars on this track's starting grid")
+        ai_count = max(0, len(spawns) - human_count)
+        num_cars = human_count + ai_count
     cars   = [Car(x, y, car_width, car_height) for x,y in spawns]
 
-    managers = [RaceManager(track, default_font) for _ in cars]
+    # lap timers run on simulation time, advanced once per fixed physics step
+    sim_clock = SimClock()
+    managers = [RaceManager(track, default_font, sim_clock) for _ in cars]
 
     # load up to 8 car‐color sprites
     car_sprite_images = []
@@ -1276,7 +1373,6 @@ def drive_car(screen, track_name):
         raw_img = car_sprite_images[idx % len(car_sprite_images)]
         c.sprite_raw = raw_img
 
-    managers = [RaceManager(track, default_font) for _ in cars]
 
         # for each human‐driven car, give it a KeyboardController
     controllers = []
@@ -1298,166 +1394,137 @@ def drive_car(screen, track_name):
         scheme = control_schemes[i % len(control_schemes)]
         controllers.append(KeyboardController(scheme))
 
-    # then AI controllers 
-    for i in range(ai_count):
-        controller = HeuristicController(
-            track=track,
-            manager=managers[i + human_count],
-            track_surface=track_surface,
-            car=cars[i + human_count]
-        )
-        controllers.append(controller)
+    # then one controller drives every AI car, with LIDAR cast against the
+    # same walls they crash on
+    from fleet import CarFleet, FleetHeuristicController
+    autopilot = FleetHeuristicController(track, walls=track.walls)
+    ai_cars, ai_managers = cars[human_count:], managers[human_count:]
 
-    for idx in range(len(cars)):
-        if idx < human_count:  # first two are humans
-            scheme = control_schemes[idx % len(control_schemes)]
-            controllers.append(KeyboardController(scheme))
-        else:
-            # create an AI controller, and give it the pre‐rendered track surface
-            controllers.append(
-                HeuristicController(track, RaceManager, track, car=cars[idx])
-            )
-            print(f"AI Controller {controllers[idx]} created for car {idx}")
+    # the cars' poses mirrored into a CarFleet, to sense them all at once
+    sensing = CarFleet.from_cars(cars)
 
 
     clock = pygame.time.Clock()
-    
+
+    step_dt     = 1.0 / physics_hz
+    max_move    = track.block_size * MAX_STEP_MOVE
+    accumulator = 0.0     # real time not yet simulated
+
+    # per-phase frame timings: F3 shows them, F4 saves them to CSV
+    prof = profiler.FrameProfiler()
+    prof.activate()
+    overlay_font = pygame.font.Font(None, 20)
+
     while True:
+        prof.begin_frame()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
+                    prof.deactivate()
                     return "MENU"
-        
-        # compute dt (in seconds)
-        dt = clock.tick(60) / 1000.0
+                prof.handle_key(event.key)
+        prof.lap('events')
+
+        # the one frame-rate limit per loop; its dt feeds the accumulator
+        accumulator += min(clock.tick(RENDER_FPS) / 1000.0, MAX_FRAME_TIME)
+        prof.lap('wait')
 
         # throttle & brake as normalized inputs
         keys = pygame.key.get_pressed()
 
-        # update with real physics
-        # 1) advance the car
-                # build a static surface with track + finish + checkpoints
-        track_surface = pygame.Surface(screen_size)
-
-        # 1a) draw base track
-        track_surface.fill((0, 200, 0))
-        track.draw(track_surface)
-
-        # now that track_surface exists, hand it to all AI controllers
-        for ai_ctrl in controllers[human_count:]:
-            ai_ctrl.track_surface = track_surface
-
-        # 1b) overlay finish line
-        bs = track.block_size
-        if getattr(track, 'finish_line', None) and len(track.finish_line) == 2:
-            (x1, y1), (x2, y2) = track.finish_line
-            p1 = (x1*bs + bs//2, y1*bs + bs//2)
-            p2 = (x2*bs + bs//2, y2*bs + bs//2)
-            pygame.draw.line(track_surface, (255,255,255), p1, p2, max(1, bs//10))
-
-        # 1c) overlay checkpoint segments
-        for (cx1, cy1), (cx2, cy2) in getattr(track, 'checkpoint_lines', []):
-            q1 = (cx1*bs + bs//2, cy1*bs + bs//2)
-            q2 = (cx2*bs + bs//2, cy2*bs + bs//2)
-            pygame.draw.line(track_surface, (255,165,0), q1, q2, max(1, bs//10))
-
-        # determine how many sub-steps so max move per step is ≤ half a cell
-        max_dist = track.block_size * 0.05
-        num_steps = max(1, int(abs(1000 * dt) / max_dist) + 1)
-        sub_dt = dt / num_steps
-
-        # after track.draw(track_surface) and lines:
-        for idx, ((x1,y1),(x2,y2)) in enumerate(track.checkpoint_lines):
-            bs = track.block_size
-            p1 = (x1*bs + bs//2, y1*bs + bs//2)
-            p2 = (x2*bs + bs//2, y2*bs + bs//2)
-            mx, my = (p1[0]+p2[0])//2, (p1[1]+p2[1])//2
-            lbl = default_font.render(str(idx+1), True, (0,0,0))
-            r = lbl.get_rect(center=(mx,my))
-            track_surface.blit(lbl, r)
-
-        for _ in range(num_steps):
-            # advance by a fraction of dt
-            # update each car’s physics & sensors
-            for idx, (mgr, c) in enumerate(zip(managers, cars)):
-                # 1) get human or AI inputs
-                thr, brk, steer = controllers[idx].get_actions(c, keys, sub_dt)
+        # update with real physics, in fixed steps until caught up
+        budget_end = time.perf_counter() + PHYSICS_BUDGET
+        while accumulator >= step_dt:
+            accumulator -= step_dt
+            sim_clock.advance(step_dt)
+            prof.count('steps')
+            # each phase runs over every car before the next one starts (cars
+            # don't see each other until the collision pass), so it can be timed
+
+            # 1) get human or AI inputs
+            for c, controller in zip(cars, controllers):
+                thr, brk, steer = controller.get_actions(c, keys, step_dt)
                 c.throttle     = thr
                 c.brake_input  = brk
                 c.steer_target = steer
-
-                # 2) update the car’s physics
-                c.update(sub_dt)
-
-                # sample sensors
-                positions = c.collision_detector.get_listener_positions()
-                colors = {}
-                for name, x, y in positions:
-                    x = max(0, min(x, screen.get_width()-1))
-                    y = max(0, min(y, screen.get_height()-1))
-                    colors[name] = track_surface.get_at((x, y))
-                c.collision_detector.update_colors(colors)
-
-                if c.collision_detector.check_wall_collision(colors):
-                    # crashes on walls as before
-                    c.handle_collision()
-
-                else:
-                    # look only at the wheel sensors for terrain
-                    wheel_colors = [col[:3] for name,col in colors.items() if 'wheel' in name]
-
-                    # sand = heaviest
-                    if any(col == SAND_COLOR     for col in wheel_colors):
-                        c.Crr = c.Crr_sand
-
-                    # then gravel
-                    elif any(col == GRAVEL_COLOR for col in wheel_colors):
-                        c.Crr = c.Crr_gravel
-
-                    # then grass
-                    elif any(col == GRASS_COLOR  for col in wheel_colors):
-                        c.Crr = c.Crr_grass
-
-                    # then blue curb (slight)
-                    elif any(col == CURB_BLUE_COLOR for col in wheel_colors):
-                        c.Crr = c.Crr_blue
-
-                    # otherwise normal track
-                    else:
-                        c.Crr = c.Crr_normal
-
-                # — after screen = pygame.display.set_mode(screen_size) —
-
-                pygame.font.init()
-                default_font = pygame.font.Font(None, 32)
-
-                # 3) update lap logic
-                mgr.update(c)
-
+            if ai_cars:
+                actions = autopilot.get_actions(ai_cars, ai_managers)
+                for c, thr, brk, steer in zip(ai_cars, *(a.tolist() for a in actions)):
+                    c.throttle     = thr
+                    c.brake_input  = brk
+                    c.steer_target = steer
+            prof.lap('controllers')
+
+            # 2) sub-step each car by its own speed; round k moves every car
+            # that needs more than k sub-steps and hasn't hit a wall yet
+            counts  = [c.substeps_for(step_dt, max_move) for c in cars]
+            starts  = [(c.x, c.y, c.yaw) for c in cars]
+            pending = list(range(len(cars)))
+            k = 0
+            while pending:
+                for i in pending:
+                    cars[i].update(step_dt / counts[i])
+                prof.count('car_substeps', len(pending))
+                prof.lap('physics')
+
+                # walls: each car's outline swept over its sub-step, exactly
+                # (see WallGeometry.sweep_cars), so no gap in a dashed wall
+                # lets it through; then the wheels' terrain sets the rolling
+                # resistance (sand, then gravel, grass, blue curb, else road)
+                sensing.load_poses(cars, pending)
+                contact = track.walls.sweep_cars(
+                    sensing.prev_x[pending], sensing.prev_y[pending], sensing.prev_yaw[pending],
+                    sensing.x[pending], sensing.y[pending], sensing.yaw[pending],
+                    car_width, car_height)
+                crr = sensing.terrain_crr(sensing.sample(track.terrain, pending))
+                prof.count('sensor_reads', crr.size * len(sensing.listener_names))
+
+                moving = []
+                for i, t, c_rr in zip(pending, contact.tolist(), crr.tolist()):
+                    if t <= 1.0:
+                        # crashes on walls as before, and stops for this step
+                        cars[i].handle_collision()
+                        continue
+                    cars[i].Crr = c_rr
+                    moving.append(i)
+                prof.lap('sensors')
+
+                # 3) update lap logic, on each sub-step's own move
+                for i in moving:
+                    managers[i].update(cars[i])
+                prof.lap('race')
+
+                k += 1
+                pending = [i for i in moving if counts[i] > k]
+
+            # the pose at the start of the step is what the car is drawn from
+            # and what a car-car collision rolls back to
+            for c, (x, y, yaw) in zip(cars, starts):
+                c.prev_x, c.prev_y, c.prev_yaw = x, y, yaw
 
             if collide_cars:
-                for i in range(len(cars)):
-                    for j in range(i+1, len(cars)):
-                        # simple AABB based on width/height
-                        r1 = pygame.Rect(
-                            cars[i].x - cars[i].width/2,
-                            cars[i].y - cars[i].height/2,
-                            cars[i].width, cars[i].height
-                        )
-                        r2 = pygame.Rect(
-                            cars[j].x - cars[j].width/2,
-                            cars[j].y - cars[j].height/2,
-                            cars[j].width, cars[j].height
-                        )
-                        if r1.colliderect(r2):
-                            cars[i].handle_collision()
-                            cars[j].handle_collision()
+                # grid broad phase + rotated-box narrow phase (collisions.py)
+                for i, j in find_car_collisions(cars, track.block_size):
+                    cars[i].handle_collision()
+                    cars[j].handle_collision()
+            prof.lap('collisions')
+
+            if time.perf_counter() > budget_end and accumulator >= step_dt:
+                # can't keep up: drop the backlog, so the game runs slow
+                # for a moment instead of owing more steps every frame
+                prof.count('dropped_steps', int(accumulator / step_dt))
+                accumulator %= step_dt
+                break
+
+        # how far the frame is between the last physics step and the next
+        alpha = accumulator / step_dt
 
         # show the pre-rendered track + lines
         screen.blit(track_surface, (0, 0))
+        prof.lap('track')
 
         # Draw the LIDAR rays for car 0
 
@@ -1471,7 +1538,7 @@ def drive_car(screen, track_name):
         num_rays = 7
         max_dist = cars[0].width * 10
 
-        rays = cars[0].get_lidar(track_surface,
+        rays = cars[0].get_lidar(track.terrain,
                                 num_rays=num_rays,
                                 fov=fov,
                                 max_dist=max_dist)
@@ -1506,17 +1573,22 @@ def drive_car(screen, track_name):
         for idx, (mgr, c) in enumerate(zip(managers, cars)):
             # Move the label down a bit for each car
             y0 = 10 + idx * 110
-            label = f"Car {idx+1}:"
-            mgr.draw(screen, x_off=10, y_off=y0, label=label)
-            c.draw(screen)
-        
+            if y0 < screen.get_height():
+                label = f"Car {idx+1}:"
+                mgr.draw(screen, x_off=10, y_off=y0, label=label)
+            prof.lap('hud')
+            c.draw(screen, alpha)
+            prof.lap('cars')
+        prof.draw_overlay(screen, overlay_font)
+        prof.lap('hud')
 
         pygame.display.flip()
-        clock.tick(60)
+        prof.lap('flip')
+        prof.end_frame()
 
 
 def main():
-    global default_font, road_tiles, CAR_IMAGE_RAW
+    global default_font
 
     # 1) Initialize Pygame and font
     pygame.init()
@@ -1529,12 +1601,7 @@ def main():
     clock = pygame.time.Clock()
 
     # 3) Convert and slice your assets now that the display is initialized
-    sheet = _sheet_raw.convert_alpha()
-    road_tiles = [
-        sheet.subsurface(pygame.Rect(col * tile_w, row * tile_h, tile_w, tile_h)).copy()
-        for row in range(3) for col in range(3)
-    ]
-    CAR_IMAGE_RAW = _car_raw.convert_alpha()
+    load_assets()
 
     # (optional) Debugging info
     print(f"Current working directory: {os.getcwd()}")
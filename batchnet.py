@@ -0,0 +1,168 @@
+"""
+NEAT genomes compiled to NumPy.
+
+compile_genome() turns a feed-forward DefaultGenome into the same layers
+neat-python's FeedForwardNetwork evaluates, stored as one dense weight
+matrix per layer. BatchNetwork stacks a whole population's compiled
+networks into padded (genomes × slots × nodes) arrays, so one forward pass
+for every genome is a handful of NumPy ops per layer rather than a Python
+walk over each genome's nodes and links.
+
+Only what config-feedforward.ini can produce is supported: sum aggregation
+and sigmoid / tanh / clamped activations, with neat-python's scaling and
+clipping. Results match FeedForwardNetwork.activate to rounding error.
+"""
+import numpy as np
+
+from neat.graphs import feed_forward_layers
+
+SIGMOID = 0
+TANH    = 1
+CLAMPED = 2
+_ACTIVATIONS = {'sigmoid': SIGMOID, 'tanh': TANH, 'clamped': CLAMPED}
+
+
+def _activate(z, acts):
+    """neat.activations' sigmoid / tanh / clamped, picked per element by `acts`."""
+    out = np.clip(z, -1.0, 1.0)
+    sig = acts == SIGMOID
+    out[sig] = 1.0 / (1.0 + np.exp(-np.clip(5.0 * z[sig], -60.0, 60.0)))
+    tanh = acts == TANH
+    out[tanh] = np.tanh(np.clip(2.5 * z[tanh], -60.0, 60.0))
+    return out
+
+
+class CompiledNetwork:
+    """
+    One genome as layered matrices. Values live in numbered slots: the
+    inputs first, then every evaluated node in layer order, then output
+    nodes that nothing feeds (these stay 0.0, as in FeedForwardNetwork).
+    Each layer is (node slots, weights[slot, node], biases, responses,
+    activation codes).
+    """
+    def __init__(self, num_inputs, num_slots, layers, output_slots):
+        self.num_inputs   = num_inputs
+        self.num_slots    = num_slots
+        self.layers       = layers
+        self.output_slots = output_slots
+
+    def activate(self, inputs):
+        """FeedForwardNetwork.activate: a list of inputs in, a list of outputs out."""
+        values = np.zeros(self.num_slots)
+        values[:self.num_inputs] = inputs
+        for slots, weights, biases, responses, acts in self.layers:
+            values[slots] = _activate(biases + responses * (values @ weights), acts)
+        return values[self.output_slots].tolist()
+
+
+def compile_genome(genome, config):
+    """
+    Builds the CompiledNetwork for `genome`, using the same expressed
+    connections and layering as FeedForwardNetwork.create. Raises
+    ValueError for aggregations or activations it can't vectorise.
+    """
+    gc = config.genome_config
+    connections = [cg.key for cg in genome.connections.values() if cg.enabled]
+    layers = feed_forward_layers(gc.input_keys, gc.output_keys, connections)
+
+    slot = {key: i for i, key in enumerate(gc.input_keys)}
+    for layer in layers:
+        for node in sorted(layer):
+            slot[node] = len(slot)
+    for key in gc.output_keys:
+        if key not in slot:
+            slot[key] = len(slot)   # never written, reads as 0.0
+    num_slots = len(slot)
+
+    compiled = []
+    for layer in layers:
+        nodes = sorted(layer)
+        column = {node: j for j, node in enumerate(nodes)}
+        weights = np.zeros((num_slots, len(nodes)))
+        for inode, onode in connections:
+            if onode in column:
+                weights[slot[inode], column[onode]] = genome.connections[inode, onode].weight
+
+        biases, responses, acts = [], [], []
+        for node in nodes:
+            ng = genome.nodes[node]
+            if ng.aggregation != 'sum':
+                raise ValueError(f"node {node}: unsupported aggregation '{ng.aggregation}'")
+            if ng.activation not in _ACTIVATIONS:
+                raise ValueError(f"node {node}: unsupported activation '{ng.activation}'")
+            biases.append(ng.bias)
+            responses.append(ng.response)
+            acts.append(_ACTIVATIONS[ng.activation])
+
+        compiled.append((np.array([slot[n] for n in nodes], dtype=np.intp), weights,
+                         np.array(biases), np.array(responses), np.array(acts)))
+
+    return CompiledNetwork(len(gc.input_keys), num_slots, compiled,
+                           np.array([slot[k] for k in gc.output_keys], dtype=np.intp))
+
+
+class BatchNetwork:
+    """
+    A population of CompiledNetworks evaluated together. Layer d of every
+    genome is padded to the widest layer d in the population; padding nodes
+    have zero weights and write to a scratch slot no real node reads.
+    """
+    def __init__(self, nets):
+        self.size        = len(nets)
+        self.num_inputs  = nets[0].num_inputs
+        self.num_slots   = max(net.num_slots for net in nets) + 1
+        scratch          = self.num_slots - 1
+        depth            = max((len(net.layers) for net in nets), default=0)
+        rows             = np.arange(self.size)
+
+        self.layers = []
+        for d in range(depth):
+            width = max(len(net.layers[d][0]) for net in nets if d < len(net.layers))
+            weights   = np.zeros((self.size, self.num_slots, width))
+            biases    = np.zeros((self.size, width))
+            responses = np.zeros((self.size, width))
+            acts      = np.full((self.size, width), CLAMPED)
+            dests     = np.full((self.size, width), scratch, dtype=np.intp)
+            for g, net in enumerate(nets):
+                if d >= len(net.layers):
+                    continue
+                slots, w, b, r, a = net.layers[d]
+                k = len(slots)
+                weights[g, :w.shape[0], :k] = w
+                biases[g, :k], responses[g, :k], acts[g, :k] = b, r, a
+                dests[g, :k] = slots
+            self.layers.append((dests, weights, biases, responses, acts))
+
+        self.output_slots = np.array([net.output_slots for net in nets])
+        self._rows = rows[:, None]
+
+    @classmethod
+    def from_genomes(cls, genomes, config):
+        return cls([compile_genome(genome, config) for genome in genomes])
+
+    def take(self, rows):
+        """
+        A BatchNetwork of just the genomes at `rows`, in that order, so a
+        shrinking population only pays for the genomes still in play.
+        """
+        sub = object.__new__(BatchNetwork)
+        sub.size       = len(rows)
+        sub.num_inputs = self.num_inputs
+        sub.num_slots  = self.num_slots
+        sub.layers     = [tuple(a[rows] for a in layer) for layer in self.layers]
+        sub.output_slots = self.output_slots[rows]
+        sub._rows      = np.arange(sub.size)[:, None]
+        return sub
+
+    def activate(self, inputs):
+        """
+        Forward pass for the whole population: `inputs` is a
+        (genomes × num_inputs) array, one row per genome in construction
+        order; returns a (genomes × num_outputs) array.
+        """
+        values = np.zeros((self.size, self.num_slots))
+        values[:, :self.num_inputs] = inputs
+        for dests, weights, biases, responses, acts in self.layers:
+            sums = np.matmul(values[:, None, :], weights)[:, 0, :]
+            values[self._rows, dests] = _activate(biases + responses * sums, acts)
+        return values[self._rows, self.output_slots]
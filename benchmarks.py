@@ -0,0 +1,359 @@
+"""
+Performance benchmarks for the simulation, sensors, track loading/drawing
+and NEAT training.
+
+    python benchmarks.py                       # run everything, print a table
+    python benchmarks.py --quick               # smaller sizes, shorter timings
+    python benchmarks.py --only lidar,draw     # just some groups
+    python benchmarks.py --out results.json    # where to write the JSON
+    python benchmarks.py --compare baseline.json [--threshold 0.10]
+
+Runs headless (SDL's dummy video driver), so it works on any Linux box.
+Every result has one headline metric (higher is better): car ticks/s,
+rays/s, samples/s, loads/s, frames/s or generations/min. --compare prints
+the change against a saved results file and exits with status 1 if any
+benchmark got slower by more than the threshold; to make a baseline, just
+keep a results file around.
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import numpy as np
+import pygame
+
+import RacingAI
+from RacingAI import Car, Track
+from fleet import CarFleet
+from integrators import STEPPERS, trajectory_error
+from terrain import IS_OBSTACLE, cast_lidar, fan_offsets, trace_lidar
+from trackcache import TrackCache
+from trackfile import TrackData, read_track, write_track
+
+CAR_COUNTS  = [1, 10, 100, 1000]
+GRID_SIZES  = [10, 50, 100, 200]
+POP_SIZES   = [10, 50]
+QUICK_CARS  = [1, 10, 100]
+QUICK_GRIDS = [10, 50]
+QUICK_POPS  = [10]
+
+DT = 1.0 / 60
+LIDAR_RAYS = 11
+
+
+def _quiet():
+    """Swallows the chatty prints from Track loading, NEAT, etc."""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def _rate(fn, work, min_time):
+    """
+    Calls fn() until at least `min_time` seconds have passed and returns
+    (work units per second, seconds per call). `work` is what one call does.
+    """
+    fn()   # warm-up: caches, lazy imports
+    calls, start = 0, time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return work * calls / elapsed, elapsed / calls
+
+
+def _spawn_cars(track, n, seed=0):
+    """`n` cars on random drivable pixels of `track`, random headings."""
+    rng = np.random.default_rng(seed)
+    ys, xs = np.nonzero(~IS_OBSTACLE[track.terrain])
+    pick = rng.integers(len(xs), size=n)
+    cw, ch = track.get_car_size()
+    cars = []
+    for x, y, yaw in zip(xs[pick], ys[pick], rng.uniform(-math.pi, math.pi, n)):
+        car = Car(float(x), float(y), cw, ch)
+        car.yaw = float(yaw)
+        car.throttle, car.steer_target = 0.5, 0.2
+        cars.append(car)
+    return cars
+
+
+def _write_grid_track(folder, grid, seed=0):
+    """A random grid×grid track (every cell filled) saved as .trk; returns its path."""
+    rng = random.Random(seed)
+    blocks = [(x, y, rng.randrange(9), rng.choice((0, 90, 180, 270)))
+              for y in range(grid) for x in range(grid)]
+    mid = grid // 2
+    data = TrackData(grid, blocks, spawn_point=(mid, mid),
+                     finish_line=[(mid, 0), (mid, grid - 1)],
+                     checkpoint_lines=[((0, mid), (grid - 1, mid))])
+    path = os.path.join(folder, f'grid{grid}.trk')
+    write_track(path, data)
+    return path
+
+
+# — benchmark groups; each yields (name, {metric: value, ...}) —
+
+def bench_physics(track, car_counts, min_time):
+    for n in car_counts:
+        cars = _spawn_cars(track, n)
+        def step_cars():
+            for car in cars:
+                car.update(DT)
+        rate, per = _rate(step_cars, n, min_time)
+        yield f'car_update/cars={n}', {'ticks_per_s': rate, 'ms_per_tick': per * 1e3}
+
+        fleet = CarFleet.from_cars(_spawn_cars(track, n))
+        rate, per = _rate(lambda: fleet.step(DT), n, min_time)
+        yield f'fleet_step/cars={n}', {'ticks_per_s': rate, 'ms_per_tick': per * 1e3}
+
+
+def bench_integrators(track, car_counts, min_time):
+    """
+    Fleet step rate with each integrator, plus its worst drift in pixels
+    from a fine rk4 reference at 120 / 60 / 30 Hz steps.
+    """
+    n = car_counts[-1]
+    for name in STEPPERS:
+        fleet = CarFleet.from_cars(_spawn_cars(track, n))
+        fleet.integrator = name
+        rate, per = _rate(lambda: fleet.step(DT), n, min_time)
+        metrics = {'ticks_per_s': rate, 'ms_per_tick': per * 1e3}
+        for hz in (120, 60, 30):
+            metrics[f'err_px_{hz}hz'] = trajectory_error(name, 1.0 / hz)
+        yield f'integrator_{name}/cars={n}', metrics
+
+
+def bench_lidar(track, car_counts, min_time):
+    terrain, field = track.terrain, track.distance_field
+    max_dist = track.get_car_size()[0] * 10
+    for n in car_counts:
+        cars = _spawn_cars(track, n)
+        rays = n * LIDAR_RAYS
+
+        def per_car(field=None):
+            for car in cars:
+                car.get_lidar(terrain, LIDAR_RAYS, math.pi, max_dist, 4, field)
+        rate, _ = _rate(per_car, rays, min_time)
+        yield f'get_lidar_step/cars={n}', {'rays_per_s': rate}
+        rate, _ = _rate(lambda: per_car(field), rays, min_time)
+        yield f'get_lidar_traced/cars={n}', {'rays_per_s': rate}
+
+        xs   = [c.x for c in cars]
+        ys   = [c.y for c in cars]
+        yaws = [c.yaw for c in cars]
+        rate, _ = _rate(lambda: cast_lidar(terrain, xs, ys, yaws, LIDAR_RAYS,
+                                           math.pi, max_dist, 4), rays, min_time)
+        yield f'cast_lidar/cars={n}', {'rays_per_s': rate}
+        rate, _ = _rate(lambda: trace_lidar(terrain, field, xs, ys, yaws, LIDAR_RAYS,
+                                            math.pi, max_dist), rays, min_time)
+        yield f'trace_lidar/cars={n}', {'rays_per_s': rate}
+        offsets = fan_offsets(LIDAR_RAYS, math.pi)
+        rate, _ = _rate(lambda: track.walls.cast(xs, ys, yaws, offsets, max_dist),
+                        rays, min_time)
+        yield f'wall_cast/cars={n}', {'rays_per_s': rate}
+
+
+def bench_sensors(track, car_counts, min_time):
+    terrain = track.terrain
+    for n in car_counts:
+        cars = _spawn_cars(track, n)
+        def sample_cars():
+            for car in cars:
+                car.collision_detector.sample(terrain)
+        rate, _ = _rate(sample_cars, n, min_time)
+        yield f'detector_sample/cars={n}', {'samples_per_s': rate}
+
+        fleet = CarFleet.from_cars(cars)
+        rate, _ = _rate(lambda: fleet.sample(terrain), n, min_time)
+        yield f'fleet_sample/cars={n}', {'samples_per_s': rate}
+
+        moved = (fleet.x + 1.0, fleet.y + 1.0, fleet.yaw + 0.01)
+        rate, _ = _rate(lambda: track.walls.sweep_cars(fleet.x, fleet.y, fleet.yaw, *moved,
+                                                       fleet.width, fleet.height),
+                        n, min_time)
+        yield f'wall_sweep/cars={n}', {'samples_per_s': rate}
+
+
+def bench_load(folder, grid_sizes, min_time):
+    cache = TrackCache(os.path.join(folder, 'cache'))
+    for grid in grid_sizes:
+        path = _write_grid_track(folder, grid)
+        csv_path = path[:-4] + '.csv'
+        write_track(csv_path, read_track(path))
+
+        def load(name, **kwargs):
+            with _quiet():
+                Track(name, **kwargs)
+
+        for label, name in (('trk', path), ('csv', csv_path)):
+            rate, per = _rate(lambda: load(name, build_terrain=False, cache=None), 1, min_time)
+            yield f'load_track_{label}/grid={grid}', {'loads_per_s': rate, 'ms': per * 1e3}
+
+        # full compile (terrain + distance field), then from a warm cache
+        rate, per = _rate(lambda: load(path, cache=None), 1, min_time)
+        yield f'load_compile_cold/grid={grid}', {'loads_per_s': rate, 'ms': per * 1e3}
+        rate, per = _rate(lambda: load(path, cache=cache), 1, min_time)
+        yield f'load_compile_cached/grid={grid}', {'loads_per_s': rate, 'ms': per * 1e3}
+
+
+def bench_draw(folder, grid_sizes, min_time):
+    screen = pygame.Surface((800, 800))
+    for grid in grid_sizes:
+        path = _write_grid_track(folder, grid)
+        with _quiet():
+            track = Track(path, cache=None)
+        rate, _ = _rate(lambda: track.draw(screen), 1, min_time)
+        yield f'track_draw/grid={grid}', {'frames_per_s': rate}
+
+        layer = track.get_static_layer()
+        rate, _ = _rate(lambda: screen.blit(layer, (0, 0)), 1, min_time)
+        yield f'static_layer_blit/grid={grid}', {'frames_per_s': rate}
+
+
+def bench_generation(track, pop_sizes, generation_time, generations):
+    """
+    The headless main_visual_ga loop: simulate, assign fitness, reproduce,
+    speciate — timed over a few generations.
+    """
+    import neat
+    from simulation import GenerationSim
+
+    cfg_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'config-feedforward.ini')
+    for pop_size in pop_sizes:
+        random.seed(0)
+        config = neat.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                             neat.DefaultSpeciesSet, neat.DefaultStagnation, cfg_path)
+        config.pop_size = pop_size
+        with _quiet():
+            pop = neat.Population(config)
+            steps = 0
+            start = time.perf_counter()
+            for gen in range(1, generations + 1):
+                sim = GenerationSim(track, list(pop.population.values()), config)
+                sim.run(generation_time, DT)
+                steps += round(sim.elapsed / DT)
+                sim.assign_fitness(verbose=False)
+                pop.population = pop.reproduction.reproduce(config, pop.species,
+                                                            pop_size, gen)
+                pop.species.speciate(config, pop.population, gen)
+            elapsed = time.perf_counter() - start
+        yield f'generation/pop={pop_size}', {
+            'generations_per_min': generations * 60 / elapsed,
+            'ticks_per_s': steps * pop_size / elapsed,
+        }
+
+
+GROUPS = ('physics', 'integrators', 'lidar', 'sensors', 'load', 'draw', 'generation')
+
+
+def run(groups, quick=False):
+    cars  = QUICK_CARS  if quick else CAR_COUNTS
+    grids = QUICK_GRIDS if quick else GRID_SIZES
+    pops  = QUICK_POPS  if quick else POP_SIZES
+    min_time = 0.05 if quick else 0.3
+
+    pygame.init()
+    RacingAI.load_assets(convert=False)
+    with _quiet():
+        track = Track('test', cache=None)
+
+    folder = tempfile.mkdtemp(prefix='apex_bench_')
+    benches = {
+        'physics':    lambda: bench_physics(track, cars, min_time),
+        'integrators': lambda: bench_integrators(track, cars, min_time),
+        'lidar':      lambda: bench_lidar(track, cars, min_time),
+        'sensors':    lambda: bench_sensors(track, cars, min_time),
+        'load':       lambda: bench_load(folder, grids, min_time),
+        'draw':       lambda: bench_draw(folder, grids, min_time),
+        'generation': lambda: bench_generation(track, pops, 2.0 if quick else 5.0,
+                                               1 if quick else 3),
+    }
+    results = {}
+    try:
+        for group in groups:
+            for name, metrics in benches[group]():
+                results[name] = metrics
+                print(f"{name:<34}" + "  ".join(f"{k} {v:,.1f}" for k, v in metrics.items()))
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints each benchmark's headline metric against `baseline` and returns
+    the names that regressed by more than `threshold` (a fraction).
+    """
+    regressions = []
+    print(f"\n{'benchmark':<34}{'baseline':>14}{'now':>14}{'change':>9}")
+    for name, metrics in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        metric = next(iter(metrics))       # the first metric is the headline one
+        if metric not in old or not old[metric]:
+            continue
+        change = metrics[metric] / old[metric] - 1
+        flag = ''
+        if change < -threshold:
+            regressions.append(name)
+            flag = '  <-- slower'
+        print(f"{name:<34}{old[metric]:>14,.1f}{metrics[metric]:>14,.1f}{change:>+9.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Optimal Apex benchmarks")
+    parser.add_argument('--quick', action='store_true', help="smaller sizes, shorter timings")
+    parser.add_argument('--only', help="comma-separated groups: " + ", ".join(GROUPS))
+    parser.add_argument('--out', default='benchmark_results.json', help="JSON results file")
+    parser.add_argument('--compare', metavar='BASELINE', help="results file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="slowdown that counts as a regression (default 0.10)")
+    args = parser.parse_args()
+
+    groups = GROUPS
+    if args.only:
+        groups = [g.strip() for g in args.only.split(',')]
+        unknown = set(groups) - set(GROUPS)
+        if unknown:
+            parser.error(f"unknown groups: {', '.join(sorted(unknown))}")
+
+    results = run(groups, args.quick)
+    with open(args.out, 'w') as f:
+        json.dump({
+            'meta': {
+                'time':     time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python':   platform.python_version(),
+                'platform': platform.platform(),
+                'numpy':    np.__version__,
+                'pygame':   pygame.version.ver,
+                'quick':    args.quick,
+            },
+            'results': results,
+        }, f, indent=2)
+    print(f"\nWrote {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than baseline by "
+                  f"more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""
+Struct-of-arrays physics for many cars at once.
+
+CarFleet holds the state Car.update integrates (position, yaw, velocity,
+steering, inputs, rolling resistance) as contiguous NumPy arrays and steps
+every car in one vectorised call, with the same drag, rolling-resistance
+and steering-rate limit as Car.update. Car objects can be copied in and out
+for drawing and for code that still works one car at a time.
+
+FleetRaceManager does the same for RaceManager's checkpoint and lap
+bookkeeping, and FleetHeuristicController drives the AI cars in drive_car.
+"""
+import math
+import numpy as np
+
+from RacingAI import Car, CarCollisionDetector, WallClock
+from integrators import STEPPERS
+from terrain import (
+    TERRAIN_CURB, TERRAIN_GRASS, TERRAIN_GRAVEL, TERRAIN_SAND, TERRAIN_WALL,
+    cast_lidar, fan_offsets,
+)
+
+
+def objective_segments(track):
+    """
+    (K+1, 2, 2) array of the race objectives' end points: checkpoint k < K,
+    then the finish line. A missing finish line is NaN, which never counts
+    as crossed.
+    """
+    nowhere = ((math.nan, math.nan), (math.nan, math.nan))
+    return np.array(list(track.checkpoint_pixels) + [track.finish_pixels or nowhere],
+                    dtype=np.float64).reshape(-1, 2, 2)
+
+
+class CarFleet:
+    def __init__(self, xs, ys, width, height, yaws=0.0):
+        n = len(xs)
+        self.width  = width
+        self.height = height
+
+        # physics parameters, shared by the fleet (same defaults as Car)
+        proto = Car(0, 0, width, height)
+        self.wheel_base       = proto.wheel_base
+        self.max_steer        = proto.max_steer
+        self.steer_speed      = proto.steer_speed
+        self.mass             = proto.mass
+        self.Cd               = proto.Cd
+        self.max_engine_force = proto.max_engine_force
+        self.max_brake_force  = proto.max_brake_force
+        self.Crr_normal       = proto.Crr_normal
+        self.Crr_blue         = proto.Crr_blue
+        self.Crr_grass        = proto.Crr_grass
+        self.Crr_gravel       = proto.Crr_gravel
+        self.Crr_sand         = proto.Crr_sand
+        self.integrator       = proto.integrator   # see integrators.py
+
+        # dynamic state
+        self.x        = np.array(xs, dtype=np.float64)
+        self.y        = np.array(ys, dtype=np.float64)
+        self.yaw      = np.broadcast_to(np.asarray(yaws, dtype=np.float64), (n,)).copy()
+        self.velocity = np.zeros(n)
+        self.steer    = np.zeros(n)
+        self.Crr      = np.full(n, self.Crr_normal, dtype=np.float64)
+
+        # inputs
+        self.throttle     = np.zeros(n)
+        self.brake_input  = np.zeros(n)
+        self.steer_target = np.zeros(n)
+
+        # for collision rollback
+        self.prev_x   = self.x.copy()
+        self.prev_y   = self.y.copy()
+        self.prev_yaw = self.yaw.copy()
+
+        # collision listeners in car space, in CarCollisionDetector order
+        listeners = CarCollisionDetector(proto).listeners
+        self.listener_names = [name for name, _ in listeners]
+        self.listener_dx = np.array([ox for _, (ox, oy) in listeners]) * width
+        self.listener_dy = np.array([oy for _, (ox, oy) in listeners]) * height
+        self.is_wheel    = np.array(['wheel' in name for name in self.listener_names])
+
+    @classmethod
+    def from_cars(cls, cars):
+        """Builds a fleet with the state of `cars` (all the same size and integrator)."""
+        fleet = cls([c.x for c in cars], [c.y for c in cars],
+                    cars[0].width, cars[0].height, [c.yaw for c in cars])
+        for name in ('velocity', 'steer', 'Crr', 'throttle', 'brake_input',
+                     'prev_x', 'prev_y', 'prev_yaw'):
+            getattr(fleet, name)[:] = [getattr(c, name) for c in cars]
+        fleet.steer_target[:] = [getattr(c, 'steer_target', 0.0) for c in cars]
+        fleet.integrator      = cars[0].integrator
+        return fleet
+
+    def __len__(self):
+        return len(self.x)
+
+    @property
+    def angle(self):
+        """Public-facing heading in degrees, as Car.angle."""
+        return -np.degrees(self.yaw)
+
+    def to_cars(self, cars, idxs=None):
+        """Copies fleet state back onto Car objects (only `idxs` if given)."""
+        if idxs is None:
+            idxs = range(len(cars))
+        for i in idxs:
+            c = cars[i]
+            c.x, c.y, c.yaw         = float(self.x[i]), float(self.y[i]), float(self.yaw[i])
+            c.prev_x, c.prev_y, c.prev_yaw = (float(self.prev_x[i]), float(self.prev_y[i]),
+                                              float(self.prev_yaw[i]))
+            c.velocity, c.steer     = float(self.velocity[i]), float(self.steer[i])
+            c.Crr                   = float(self.Crr[i])
+            c.throttle, c.brake_input = float(self.throttle[i]), float(self.brake_input[i])
+            c.steer_target          = float(self.steer_target[i])
+            c.angle                 = -math.degrees(c.yaw)
+
+    def load_poses(self, cars, idxs):
+        """
+        Copies the pose and previous pose of the Car objects at `idxs` (a
+        list) into the same rows, so the fleet can sense for them.
+        """
+        for name in ('x', 'y', 'yaw', 'prev_x', 'prev_y', 'prev_yaw'):
+            getattr(self, name)[idxs] = [getattr(cars[i], name) for i in idxs]
+
+    def step(self, dt, idxs=None):
+        """
+        Car.update for every car, or just the cars at `idxs` (an index or
+        boolean array), with self.integrator; the others are left untouched.
+        """
+        sel = slice(None) if idxs is None else idxs
+        x, y, yaw = self.x[sel], self.y[sel], self.yaw[sel]
+        velocity, steer = self.velocity[sel], self.steer[sel]
+
+        # save previous in case we need to roll back on collision
+        self.prev_x[sel], self.prev_y[sel], self.prev_yaw[sel] = x, y, yaw
+
+        x, y, yaw, velocity, steer = STEPPERS[self.integrator](
+            self, x, y, yaw, velocity, steer, self.throttle[sel], self.brake_input[sel],
+            self.Crr[sel], self.steer_target[sel], dt)
+
+        self.x[sel], self.y[sel], self.yaw[sel] = x, y, yaw
+        self.velocity[sel] = velocity
+        self.steer[sel]    = steer
+
+    def handle_collision(self, idxs):
+        """Car.handle_collision for the cars at `idxs`: roll back and stop."""
+        self.x[idxs]   = self.prev_x[idxs]
+        self.y[idxs]   = self.prev_y[idxs]
+        self.yaw[idxs] = self.prev_yaw[idxs]
+        self.velocity[idxs] = 0.0
+
+    def listener_positions(self, idxs=None):
+        """
+        Integer screen positions of every collision listener, as two
+        (cars × listeners) arrays in CarCollisionDetector.listeners order.
+        """
+        sel = slice(None) if idxs is None else idxs
+        # same rounding path as CarCollisionDetector (via the angle in degrees)
+        rad   = -np.radians(-np.degrees(self.yaw[sel]))
+        cos_a = np.cos(rad)[:, None]
+        sin_a = np.sin(rad)[:, None]
+        rx = self.listener_dx * cos_a - self.listener_dy * sin_a
+        ry = self.listener_dx * sin_a + self.listener_dy * cos_a
+        px = np.trunc(self.x[sel, None] + rx).astype(np.intp)
+        py = np.trunc(self.y[sel, None] + ry).astype(np.intp)
+        return px, py
+
+    def sample(self, terrain, idxs=None):
+        """
+        CarCollisionDetector.sample for the whole fleet: a (cars × listeners)
+        array of terrain classes, clamped to the map edges.
+        """
+        height, width = terrain.shape
+        px, py = self.listener_positions(idxs)
+        return terrain[np.clip(py, 0, height-1), np.clip(px, 0, width-1)]
+
+    def wall_hits(self, classes):
+        """Per car: does any body (non-wheel) listener see a wall?"""
+        return ((classes == TERRAIN_WALL) & ~self.is_wheel).any(axis=1)
+
+    def wheels_on(self, classes, terrain_class):
+        """Per car: does any wheel listener see `terrain_class`?"""
+        return ((classes == terrain_class) & self.is_wheel).any(axis=1)
+
+    def terrain_crr(self, classes):
+        """
+        Rolling resistance from the wheel listeners, with drive_car's
+        priority: sand, then gravel, grass, blue curb, else normal track.
+        """
+        crr = np.full(len(classes), self.Crr_normal)
+        for cls, value in ((TERRAIN_CURB,   self.Crr_blue),
+                           (TERRAIN_GRASS,  self.Crr_grass),
+                           (TERRAIN_GRAVEL, self.Crr_gravel),
+                           (TERRAIN_SAND,   self.Crr_sand)):
+            crr[self.wheels_on(classes, cls)] = value
+        return crr
+
+
+class FleetRaceManager:
+    """
+    RaceManager.update and get_next_checkpoint_info for a whole CarFleet:
+    checkpoint index, lap count and lap timing per car are arrays, and every
+    car's crossing test runs in one vectorised pass. Same rules as
+    RaceManager — checkpoints in order, then the finish line for a lap —
+    minus the console messages.
+    """
+    def __init__(self, track, n, clock=None):
+        self.track = track
+        self.clock = clock if clock is not None else WallClock()
+        self.num_checkpoints = len(track.checkpoint_pixels)
+
+        segs = objective_segments(track)
+        self.seg_start = segs[:, 0]
+        self.seg_dir   = segs[:, 1] - segs[:, 0]
+        self.midpoints = (segs[:, 0] + segs[:, 1]) * 0.5
+
+        self.current_cp_idx = np.zeros(n, dtype=np.intp)
+        self.lap_count      = np.zeros(n, dtype=np.intp)
+        self.lap_start      = np.full(n, self.clock.now())
+        self.best_lap       = np.full(n, np.inf)     # inf until a lap is done
+        self.lap_times      = [[] for _ in range(n)]
+
+    def update(self, fleet, idxs):
+        """
+        RaceManager.update for the cars at `idxs` (index array), using the
+        fleet's prev_x/prev_y → x/y move of the last step.
+        """
+        idxs = np.asarray(idxs, dtype=np.intp)
+        cp   = self.current_cp_idx[idxs]
+        a    = self.seg_start[cp]
+        d    = self.seg_dir[cp]
+
+        # same side-of-line test as RaceManager._crossed
+        side0 = (fleet.prev_x[idxs] - a[:, 0]) * d[:, 1] - (fleet.prev_y[idxs] - a[:, 1]) * d[:, 0]
+        side1 = (fleet.x[idxs]      - a[:, 0]) * d[:, 1] - (fleet.y[idxs]      - a[:, 1]) * d[:, 0]
+        crossed = idxs[side0 * side1 < 0]
+        if not len(crossed):
+            return
+
+        finished = self.current_cp_idx[crossed] == self.num_checkpoints
+        self.current_cp_idx[crossed[~finished]] += 1
+
+        laps = crossed[finished]
+        if len(laps):
+            now = self.clock.now()
+            durations = now - self.lap_start[laps]
+            for i, duration in zip(laps.tolist(), durations.tolist()):
+                self.lap_times[i].append(duration)
+            self.best_lap[laps]       = np.minimum(self.best_lap[laps], durations)
+            self.lap_start[laps]      = now
+            self.lap_count[laps]     += 1
+            self.current_cp_idx[laps] = 0
+
+    def next_checkpoint_info(self, fleet, idxs):
+        """
+        RaceManager.get_next_checkpoint_info for the cars at `idxs`: arrays
+        of distance (pixels) to the next objective's midpoint and its
+        bearing relative to the car's yaw, both 0 with no objective.
+        """
+        m  = self.midpoints[self.current_cp_idx[idxs]]
+        dx = m[:, 0] - fleet.x[idxs]
+        dy = m[:, 1] - fleet.y[idxs]
+        dist = np.hypot(dx, dy)
+        rel  = (np.arctan2(dy, dx) - fleet.yaw[idxs] + math.pi) % (2*math.pi) - math.pi
+
+        none = np.isnan(dist)
+        dist[none] = 0.0
+        rel[none]  = 0.0
+        return dist, rel
+
+
+class FleetHeuristicController:
+    """
+    Rule-based driver for the AI cars: heads for the next checkpoint,
+    dodges toward the clearer side when the LIDAR fan is blocked, and
+    reverses when about to hit something. One batched LIDAR cast and
+    checkpoint lookup per call for every car. With `walls` (a
+    WallGeometry) the rays are cast against the wall segments, otherwise
+    stepped over the terrain map with cast_lidar.
+    """
+    def __init__(self, track, num_rays=11, fov=math.pi, dead_zone=0.2, walls=None):
+        self.track        = track
+        self.walls        = walls
+        self.num_rays     = num_rays
+        self.fov          = fov
+        self.offsets      = fan_offsets(num_rays, fov)
+        self.dead_zone    = dead_zone
+        self.block_thresh = 0.75
+        self.crash_thresh = 0.15   # closer than this straight ahead: back up
+        self.midpoints    = objective_segments(track).mean(axis=1)
+
+    def get_actions(self, cars, managers):
+        """
+        (throttle, brake, steer target) arrays for `cars`, each racing
+        against the RaceManager at the same position in `managers`.
+        """
+        x   = np.array([c.x for c in cars])
+        y   = np.array([c.y for c in cars])
+        yaw = np.array([c.yaw for c in cars])
+        velocity = np.array([c.velocity for c in cars])
+        max_dist  = cars[0].width * 10
+        max_steer = cars[0].max_steer
+
+        # 1) sense: LIDAR fan, and RaceManager.get_next_checkpoint_info
+        if self.walls is not None:
+            rays = self.walls.cast(x, y, yaw, self.offsets, max_dist)
+        else:
+            rays = cast_lidar(self.track.terrain, x, y, yaw,
+                              self.num_rays, self.fov, max_dist)
+        m  = self.midpoints[[mgr.current_cp_idx for mgr in managers]]
+        dx = m[:, 0] - x
+        dy = m[:, 1] - y
+        ang_to_cp = np.nan_to_num((np.arctan2(dy, dx) - yaw + math.pi) % (2*math.pi) - math.pi)
+
+        center       = len(self.offsets) // 2
+        forward_dist = rays[:, center]
+        left_clear   = rays[:, :center].sum(axis=1)
+        right_clear  = rays[:, center+1:].sum(axis=1)
+
+        # 2) steering: dodge when blocked ahead, else head for the checkpoint
+        # unless that side is blocked too
+        desired = np.clip(ang_to_cp, -max_steer, max_steer)
+        steer = np.where(desired > 0,
+                         np.where(left_clear  >= self.block_thresh, desired, -max_steer),
+                         np.where(right_clear >= self.block_thresh, desired,  max_steer))
+        steer[np.abs(desired) < self.dead_zone] = 0.0
+        blocked = forward_dist < self.block_thresh
+        steer[blocked] = np.where(right_clear > left_clear, -max_steer, max_steer)[blocked]
+
+        # 3) throttle: reverse (steering the other way) when about to hit
+        # something or stopped, else full throttle, or 0.7 when blocked
+        reverse  = (forward_dist < self.crash_thresh) | (velocity == 0)
+        throttle = np.where(reverse, -1.0, np.where(forward_dist > self.block_thresh, 1.0, 0.7))
+        steer[reverse] = -steer[reverse]
+        return throttle, np.zeros(len(cars)), steer
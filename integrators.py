@@ -0,0 +1,169 @@
+"""
+Time integrators for the kinematic bicycle model Car and CarFleet drive.
+
+Each stepper advances (x, y, yaw, velocity, steer) by dt for fixed inputs and
+works on plain floats or NumPy arrays alike. `p` is anything with the Car
+physics attributes (a Car or a CarFleet).
+
+  euler  what Car.update has always done: velocity, then steering, then the
+         pose along a straight line at the new heading. Cheap, but its
+         error grows with dt and heavy rolling resistance (sand) makes the
+         velocity overshoot and ring at large steps.
+  arc    semi-implicit: drag and rolling resistance are split between the
+         start and the end of the step, so they damp without overshooting
+         at any sensible dt, and the pose moves the step's distance along the exact circular arc the
+         bicycle model traces at the mid-step steering angle.
+  rk4    classic fourth order Runge-Kutta on the full model, with the rate
+         limited steering angle integrated exactly inside the step.
+
+trajectory_error() measures how far one drifts from a very fine rk4
+reference; test_integrators.py and benchmarks.py both use it.
+"""
+import functools
+import math
+
+import numpy as np
+
+EULER = 'euler'
+ARC   = 'arc'
+RK4   = 'rk4'
+
+# below this steering angle the bicycle model drives straight (as the original Car.update)
+STRAIGHT_STEER = 1e-4
+
+
+# np.where and np.clip, except that plain floats (Car.update) stay plain
+# floats: the ufuncs would turn them into 0-d arrays, several times slower
+# for every operation after
+
+def _where(cond, a, b):
+    if isinstance(cond, np.ndarray):
+        return np.where(cond, a, b)
+    return a if cond else b
+
+
+def _clip(x, lo, hi):
+    if isinstance(x, np.ndarray):
+        return np.clip(x, lo, hi)
+    return min(max(x, lo), hi)
+
+
+def _accel(p, v, throttle, brake, Crr):
+    """Longitudinal acceleration: engine, brake, drag and rolling resistance."""
+    return (throttle * p.max_engine_force + brake * p.max_brake_force
+            - p.Cd * v * np.abs(v) - Crr * v) / p.mass
+
+
+def _steer_at(p, steer, target, t):
+    """Steering angle `t` seconds on, turning toward `target` at steer_speed."""
+    limit = p.steer_speed * t
+    return steer + _clip(target - steer, -limit, limit)
+
+
+def _turn_radius(p, steer):
+    """(turning?, radius wheel_base / tan(steer), 1 where not turning)."""
+    turning = np.abs(steer) > STRAIGHT_STEER
+    return turning, p.wheel_base / _where(turning, np.tan(steer), 1.0)
+
+
+def _yaw_rate(p, v, steer):
+    turning, radius = _turn_radius(p, steer)
+    return _where(turning, -(v / radius), 0.0)
+
+
+def step_euler(p, x, y, yaw, v, steer, throttle, brake, Crr, target, dt):
+    v     = v + _accel(p, v, throttle, brake, Crr) * dt
+    steer = _steer_at(p, steer, target, dt)
+    yaw   = yaw + _yaw_rate(p, v, steer) * dt
+    return x + v * np.cos(yaw) * dt, y + v * np.sin(yaw) * dt, yaw, v, steer
+
+
+def step_arc(p, x, y, yaw, v, steer, throttle, brake, Crr, target, dt):
+    # drag and rolling resistance are a damping rate on v, taken half at the
+    # start and half at the end of the step (trapezoid), with drag's |v|
+    # from an implicit Euler guess at the end speed
+    push = (throttle * p.max_engine_force + brake * p.max_brake_force) / p.mass
+    v1   = (v + push * dt) / (1.0 + (Crr + p.Cd * np.abs(v)) / p.mass * dt)
+    damp = (Crr + p.Cd * np.abs(v + v1) / 2) / p.mass * dt / 2
+    v1   = (v * (1.0 - damp) + push * dt) / (1.0 + damp)
+
+    # the step's distance (trapezoid on speed) along one circle of radius
+    # wheel_base / tan(steer at mid-step), or straight ahead
+    dist = (v + v1) / 2 * dt
+    turning, radius = _turn_radius(p, _steer_at(p, steer, target, dt / 2))
+    yaw1 = yaw - _where(turning, dist / radius, 0.0)
+    x1 = _where(turning, x - radius * (np.sin(yaw1) - np.sin(yaw)), x + dist * np.cos(yaw))
+    y1 = _where(turning, y + radius * (np.cos(yaw1) - np.cos(yaw)), y + dist * np.sin(yaw))
+    return x1, y1, yaw1, v1, _steer_at(p, steer, target, dt)
+
+
+def step_rk4(p, x, y, yaw, v, steer, throttle, brake, Crr, target, dt):
+    def deriv(t, yaw, v):
+        s = _steer_at(p, steer, target, t)
+        return (v * np.cos(yaw), v * np.sin(yaw), _yaw_rate(p, v, s),
+                _accel(p, v, throttle, brake, Crr))
+
+    h = dt / 2
+    k1 = deriv(0.0, yaw, v)
+    k2 = deriv(h, yaw + h * k1[2], v + h * k1[3])
+    k3 = deriv(h, yaw + h * k2[2], v + h * k2[3])
+    k4 = deriv(dt, yaw + dt * k3[2], v + dt * k3[3])
+    x, y, yaw, v = (s + dt / 6 * (a + 2 * b + 2 * c + d)
+                    for s, a, b, c, d in zip((x, y, yaw, v), k1, k2, k3, k4))
+    return x, y, yaw, v, _steer_at(p, steer, target, dt)
+
+
+STEPPERS = {EULER: step_euler, ARC: step_arc, RK4: step_rk4}
+
+
+# inputs change every CONTROL_PERIOD seconds; every dt compared divides it
+CONTROL_PERIOD = 0.4
+REFERENCE_DT   = 1.0 / 1920
+
+
+def _controls(k, n, rng):
+    """Throttle, brake and steer target of `n` cars for control period `k`."""
+    throttle = np.where(k % 4 < 3, rng.uniform(0.5, 1.0, n), 0.0)
+    brake    = np.where(k % 4 == 3, rng.uniform(0.2, 0.6, n), 0.0)
+    target   = rng.uniform(-1.0, 1.0, n) * math.radians(30)
+    return throttle, brake, target
+
+
+def _drive(integrator, dt, duration, n, seed):
+    """
+    Drives `n` cars from the origin through a random throttle / brake /
+    steering script with `integrator` at `dt`; returns their (x, y) at the
+    end of every control period. Half the cars are on sand.
+    """
+    from fleet import CarFleet   # fleet imports this module
+
+    steps = round(CONTROL_PERIOD / dt)
+    if not math.isclose(steps * dt, CONTROL_PERIOD):
+        raise ValueError(f"dt={dt} doesn't divide the {CONTROL_PERIOD}s control period")
+
+    fleet = CarFleet(np.zeros(n), np.zeros(n), 20, 10)
+    fleet.integrator = integrator
+    fleet.Crr[n // 2:] = fleet.Crr_sand
+    rng = np.random.default_rng(seed)
+    path = []
+    for k in range(round(duration / CONTROL_PERIOD)):
+        fleet.throttle[:], fleet.brake_input[:], fleet.steer_target[:] = _controls(k, n, rng)
+        for _ in range(steps):
+            fleet.step(dt)
+        path.append((fleet.x.copy(), fleet.y.copy()))
+    return path
+
+
+@functools.lru_cache(maxsize=None)
+def _reference(duration, n, seed):
+    return _drive(RK4, REFERENCE_DT, duration, n, seed)
+
+
+def trajectory_error(integrator, dt, duration=4.0, n=16, seed=0):
+    """
+    Largest distance in pixels, over all cars and control periods, between
+    `integrator` at `dt` and rk4 at REFERENCE_DT on the same script.
+    """
+    path = _drive(integrator, dt, duration, n, seed)
+    return max(float(np.hypot(x - rx, y - ry).max())
+               for (x, y), (rx, ry) in zip(path, _reference(duration, n, seed)))
@@ -0,0 +1,157 @@
+"""
+Per-frame instrumentation for the game and training loops.
+
+A FrameProfiler splits each frame into named phases with a lap timer: call
+lap('physics') after the physics code and the time since the previous lap
+is charged to 'physics' (laps with the same name add up, so a phase run in
+every sub-step is totalled per frame). Counters tally hot-path work such as
+rays cast or sensor lookups; library code reports them through the module
+level count(), which goes to whichever profiler is active.
+
+The last few thousand frames are kept for export_csv(); draw_overlay() shows
+a rolling average on screen. Everything is a no-op while disabled.
+"""
+import csv
+import os
+import time
+from collections import deque
+
+import pygame
+
+PROFILE_DIR = os.path.join(os.path.dirname(__file__), 'profiles')
+
+# the profiler count() reports to, set by FrameProfiler.activate()
+_active = None
+
+
+def count(name, n=1):
+    """Adds `n` to counter `name` on the active profiler, if there is one."""
+    if _active is not None:
+        _active.count(name, n)
+
+
+class FrameProfiler:
+    def __init__(self, enabled=True, history=5000, window=60):
+        self.enabled      = enabled
+        self.show_overlay = False
+        self.window       = window          # frames averaged by the overlay
+        self.frames       = deque(maxlen=history)  # (total s, {phase: s}, {counter: n})
+        self.phases       = []              # phase names in first-seen order
+        self.counters     = []              # counter names in first-seen order
+        self.frame_index  = 0
+        self._times  = {}
+        self._counts = {}
+        self._start  = self._last = None
+
+    def activate(self):
+        """Makes this the profiler that module-level count() reports to."""
+        global _active
+        _active = self
+
+    def deactivate(self):
+        global _active
+        if _active is self:
+            _active = None
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self._times  = {}
+        self._counts = {}
+        self._start  = self._last = time.perf_counter()
+
+    def lap(self, phase):
+        """Charges the time since the last lap (or begin_frame) to `phase`."""
+        if not self.enabled or self._last is None:
+            return
+        now = time.perf_counter()
+        self._times[phase] = self._times.get(phase, 0.0) + now - self._last
+        self._last = now
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self._counts[name] = self._counts.get(name, 0) + n
+
+    def end_frame(self):
+        if not self.enabled or self._start is None:
+            return
+        total = time.perf_counter() - self._start
+        for name in self._times:
+            if name not in self.phases:
+                self.phases.append(name)
+        for name in self._counts:
+            if name not in self.counters:
+                self.counters.append(name)
+        self.frames.append((total, self._times, self._counts))
+        self.frame_index += 1
+        self._start = self._last = None
+
+    def averages(self, frames=None):
+        """
+        ({phase: mean ms}, {counter: mean per frame}, mean frame ms) over the
+        last `frames` recorded frames (default: the overlay window).
+        """
+        recent = list(self.frames)[-(frames or self.window):]
+        if not recent:
+            return {}, {}, 0.0
+        n = len(recent)
+        phases = {p: sum(t.get(p, 0.0) for _, t, _ in recent) * 1000 / n
+                  for p in self.phases}
+        counts = {c: sum(k.get(c, 0) for _, _, k in recent) / n
+                  for c in self.counters}
+        return phases, counts, sum(total for total, _, _ in recent) * 1000 / n
+
+    def handle_key(self, key):
+        """
+        F3 toggles the overlay, F4 exports the recorded frames to CSV.
+        Returns True if the key was one of these.
+        """
+        if key == pygame.K_F3:
+            self.show_overlay = not self.show_overlay
+        elif key == pygame.K_F4:
+            print(f"Frame profile written to '{self.export_csv()}'")
+        else:
+            return False
+        return True
+
+    def draw_overlay(self, screen, font, pos=None):
+        """Rolling per-phase ms and per-frame counts, if the overlay is on."""
+        if not (self.enabled and self.show_overlay):
+            return
+        phases, counts, total = self.averages()
+        lines = [f"frame {total:6.2f} ms  ({1000 / total:5.0f} fps)" if total else "frame --"]
+        lines += [f"{name:<12}{ms:6.2f} ms" for name, ms in phases.items()]
+        lines += [f"{name:<12}{n:8.0f} /frame" for name, n in counts.items()]
+
+        surfs  = [font.render(line, True, (255, 255, 255)) for line in lines]
+        width  = max(s.get_width() for s in surfs) + 12
+        height = sum(s.get_height() for s in surfs) + 12
+        x, y = pos if pos is not None else (screen.get_width() - width - 10, 10)
+
+        panel = pygame.Surface((width, height), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 170))
+        screen.blit(panel, (x, y))
+        y += 6
+        for surf in surfs:
+            screen.blit(surf, (x + 6, y))
+            y += surf.get_height()
+
+    def export_csv(self, path=None):
+        """
+        Writes one row per recorded frame: frame index, total ms, each
+        phase in ms, then each counter. Returns the path written.
+        """
+        if path is None:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            path = os.path.join(PROFILE_DIR,
+                                time.strftime('frame_profile_%Y%m%d_%H%M%S.csv'))
+        first = self.frame_index - len(self.frames)
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', 'total_ms']
+                            + [f'{p}_ms' for p in self.phases] + self.counters)
+            for i, (total, times, counts) in enumerate(self.frames, start=first):
+                writer.writerow([i, f'{total * 1000:.4f}']
+                                + [f'{times.get(p, 0.0) * 1000:.4f}' for p in self.phases]
+                                + [counts.get(c, 0) for c in self.counters])
+        return path
@@ -0,0 +1,75 @@
+"""
+One tick's worth of sensor readings for a CarFleet.
+
+A SensorFrame holds every configured LIDAR fan and the next-checkpoint
+distance/bearing for each car, as of the last time that car was sensed.
+refresh() traces all the fans for the given cars in a single batch and
+looks up their checkpoints once; after that the networks, the reward terms
+and the viewer all read the cached arrays instead of casting their own
+rays. A car's readings stay valid until it moves, so the frame taken right
+after a physics step also serves the controllers at the start of the next.
+
+Given the track's WallGeometry as `walls`, the fans are cast against the
+wall segments instead of sphere traced over the terrain map.
+"""
+import math
+
+import numpy as np
+
+from terrain import fan_offsets, trace_rays
+
+# name -> (number of rays, field of view); the 'net' fan feeds the networks
+# and the 'wall' fan the wall-proximity penalty
+DEFAULT_FANS = {
+    'net':  (11, math.pi),
+    'wall': (7,  math.pi * 0.75),
+}
+
+
+class SensorFrame:
+    def __init__(self, track, fleet, race, max_dist, fans=DEFAULT_FANS, walls=None):
+        self.track    = track
+        self.walls    = walls
+        self.fleet    = fleet
+        self.race     = race
+        self.max_dist = max_dist
+        self.fans     = dict(fans)
+
+        # every fan's angles back to back, so one trace covers them all
+        self.columns = {}
+        offsets = []
+        for name, (num_rays, fov) in self.fans.items():
+            start = sum(len(o) for o in offsets)
+            self.columns[name] = slice(start, start + num_rays)
+            offsets.append(fan_offsets(num_rays, fov))
+        self.offsets  = np.concatenate(offsets)
+        self.num_rays = len(self.offsets)
+
+        n = len(fleet)
+        self.rays     = np.zeros((n, self.num_rays))   # normalised to [0..1]
+        self.cp_dist  = np.zeros(n)
+        self.cp_angle = np.zeros(n)
+
+    def refresh(self, idxs):
+        """Senses the cars at `idxs` (index array) where they are now."""
+        fleet, track = self.fleet, self.track
+        if self.walls is not None:
+            self.rays[idxs] = self.walls.cast(fleet.x[idxs], fleet.y[idxs], fleet.yaw[idxs],
+                                              self.offsets, self.max_dist)
+        else:
+            self.rays[idxs] = trace_rays(track.terrain, track.distance_field,
+                                         fleet.x[idxs], fleet.y[idxs], fleet.yaw[idxs],
+                                         self.offsets, self.max_dist)
+        self.cp_dist[idxs], self.cp_angle[idxs] = self.race.next_checkpoint_info(fleet, idxs)
+
+    def lidar(self, name, idxs):
+        """Fan `name`'s readings for the cars at `idxs`, one row per car."""
+        return self.rays[idxs, self.columns[name]]
+
+    def checkpoint(self, idxs):
+        """(distance, relative bearing) arrays to each car's next objective."""
+        return self.cp_dist[idxs], self.cp_angle[idxs]
+
+    def fan_angles(self, name, idx):
+        """World-space angles of fan `name` for car `idx`, for drawing."""
+        return self.fleet.yaw[idx] + self.offsets[self.columns[name]]
@@ -0,0 +1,388 @@
+"""
+Headless simulation engine for NEAT training.
+
+GenerationSim steps every car of one generation (batched network inputs,
+CarFleet physics, collision sensors, lap/checkpoint progress and the shaped reward)
+without a display or a frame limiter. train_live_neat.py can attach its pygame window
+to it as a viewer, or run it flat out on a box with no display at all.
+"""
+import math
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from RacingAI import Car, SimClock, Track, compute_spawns
+from batchnet import BatchNetwork
+from fleet import CarFleet, FleetRaceManager
+from profiler import FrameProfiler
+from sensors import SensorFrame
+from terrain import TERRAIN_GRASS
+
+# — shaped‐reward constants, applied in GenerationSim._score_car —
+CRASH_PENALTY     = 0
+IDLE_PENALTY_RATE = 0        # per second idling
+PROXIMITY_SCALE   = 600.0    # per‐pixel reduction → reward
+MAX_IDLE_SPEED    = 0.2      # below this, we call “idle”
+LAP_BONUS         = 500000.0
+HEADING_SCALE     = 0        # tune this
+SPEED_SCALE       = 2
+WALL_SCALE        = 200.0
+CHECKPOINT_BONUS  = 200000.0
+STEER_PENALTY     = 0        # per radian per second
+STRAIGHT_BONUS    = 0.0
+TURN_AWAY_REWARD  = 50.0
+TURN_AWAY_PENALTY = 25.0
+
+# a car that clears no checkpoint for this many simulated seconds is retired
+# (stops simulating and scoring); None keeps every car running
+STALL_WINDOW      = 5.0
+
+
+class GenerationSim:
+    """
+    One generation of cars, one per genome, sensing the track's compiled
+    terrain map. Physics runs on a CarFleet, checkpoint/lap progress on a
+    FleetRaceManager and every genome's network in one BatchNetwork;
+    self.cars mirror the fleet's state for the viewer. Each car is sensed
+    once per step into self.sensors, which the networks, the reward and the
+    viewer all read.
+    Only the cars in self.active are simulated. Cars leave it when they hit
+    a wall or, with a `stall_window`, when they go that many simulated
+    seconds without clearing a checkpoint; their fitness is final from then.
+    Call step(dt) until it returns False or the time budget runs out, then
+    assign_fitness() to write the scores back onto the genomes.
+
+    With `stop_when_idle` the generation also ends as soon as every active
+    car is idle. That's a guess (an idle car may still pull away and score),
+    so it's off by default: a car's fitness then depends only on its own
+    genome, not on which other cars share the run.
+    """
+    def __init__(self, track, genomes, config, profiler=None,
+                 stall_window=STALL_WINDOW, stop_when_idle=False):
+        self.track      = track
+        # step() reports its phases to the viewer's profiler, if it has one
+        self.profiler   = profiler if profiler is not None else FrameProfiler(enabled=False)
+        self.genomes    = genomes
+        # generation budget and lap timers all run on simulation time
+        self.clock      = SimClock()
+
+        # thresholds that scale with the track
+        self.wall_thresh  = track.block_size * 0.3
+        # how close is “too close” to the wall
+        self.warning_dist = track.block_size * 2
+
+        spawns = compute_spawns(track.spawn_point, len(genomes), False, track)
+        cw, ch = track.get_car_size()
+        # LIDAR reaches ten car‐lengths
+        self.lidar_range = cw * 10
+
+        self.cars  = [Car(x, y, cw, ch) for x, y in spawns]
+        self.fleet = CarFleet.from_cars(self.cars)
+        # one row per genome, same order as self.cars
+        self.net   = BatchNetwork.from_genomes(genomes, config)
+        self.race  = FleetRaceManager(track, len(genomes), self.clock)
+        self.sensors = SensorFrame(track, self.fleet, self.race, self.lidar_range)
+
+        self.fitness_scores = [0.0] * len(genomes)
+        self.crashed        = np.zeros(len(genomes), dtype=bool)
+        self.retired        = np.zeros(len(genomes), dtype=bool)   # stalled out
+
+        # active set: indices of the cars still being simulated, and the
+        # networks of exactly those cars
+        self.active      = np.arange(len(genomes))
+        self.active_net  = self.net
+        self.stall_window  = stall_window
+        self.stop_when_idle = stop_when_idle
+        self.progress      = np.zeros(len(genomes), dtype=np.intp)
+        self.last_progress = np.zeros(len(genomes))   # sim time of last checkpoint
+        # sense everyone at the start line; record initial distance to next checkpoint
+        all_cars = np.arange(len(genomes))
+        self._sense(all_cars)
+        self.prev_dists     = self.sensors.cp_dist.tolist()
+        self.last_cp_idxs   = self.race.current_cp_idx.tolist()
+
+    @property
+    def elapsed(self):
+        """Simulated seconds since the generation started."""
+        return self.clock.now()
+
+    def step(self, dt):
+        """
+        Advance every active car by `dt` seconds.
+        Returns False once no car is left active (or, with stop_when_idle,
+        every active car is idle), and the generation can end early.
+        """
+        self.clock.advance(dt)
+        fleet   = self.fleet
+        terrain = self.track.terrain
+        prof    = self.profiler
+
+        # only active cars are simulated; every one of them was sensed where
+        # it stands at the end of the last step (or in __init__)
+        live = self.active
+        rays = self.sensors.lidar('net', live)
+        cp_dists, cp_angs = self.sensors.checkpoint(live)
+        self._act(live, rays, cp_dists, cp_angs)
+        prof.lap('networks')
+
+        # physics and collision sampling for all live cars at once
+        fleet.step(dt, live)
+        prof.lap('physics')
+        cols = fleet.sample(terrain, live)
+        prof.count('sensor_reads', cols.size)
+        hit  = fleet.wall_hits(cols)
+        crashed_now = live[hit]
+        fleet.handle_collision(crashed_now)
+        self.crashed[crashed_now] = True
+        for idx in crashed_now:
+            self.fitness_scores[idx] -= CRASH_PENALTY
+
+        moved = live[~hit]
+        offtrack = fleet.wheels_on(cols[~hit], TERRAIN_GRASS)
+        fleet.Crr[moved] = np.where(offtrack, fleet.Crr_sand, fleet.Crr_normal)
+        fleet.to_cars(self.cars, live)
+        prof.lap('sensors')
+        self.race.update(fleet, moved)
+        prof.lap('race')
+
+        # sense the cars still on track where they ended up: the wall fan
+        # scores this step, the network fan drives the next one
+        self._sense(moved)
+        prof.lap('lidar')
+        dists = self.sensors.lidar('wall', moved)
+        cp_dists, _ = self.sensors.checkpoint(moved)
+        for idx, car_dists, cp_dist in zip(moved, dists, cp_dists.tolist()):
+            self._score_car(idx, car_dists, cp_dist, dt)
+        prof.lap('reward')
+
+        self._update_active(moved, hit.any())
+
+        # — generation idle check —
+        if not len(self.active):
+            return False
+        return not (self.stop_when_idle
+                    and (np.abs(fleet.velocity[self.active]) < MAX_IDLE_SPEED).all())
+
+    def _update_active(self, moved, any_crashed):
+        """
+        Drops crashed cars and cars that have stalled for stall_window from
+        the active set, and shrinks the batched networks to match.
+        """
+        stalled = np.zeros(len(moved), dtype=bool)
+        if self.stall_window is not None:
+            now = self.elapsed
+            # laps × (checkpoints + 1) + index only ever goes up
+            progress = (self.race.lap_count[moved] * (self.race.num_checkpoints + 1)
+                        + self.race.current_cp_idx[moved])
+            advanced = progress > self.progress[moved]
+            self.progress[moved[advanced]] = progress[advanced]
+            self.last_progress[moved[advanced]] = now
+            stalled = now - self.last_progress[moved] >= self.stall_window
+            self.retired[moved[stalled]] = True
+
+        if any_crashed or stalled.any():
+            keep = ~(self.crashed[self.active] | self.retired[self.active])
+            self.active     = self.active[keep]
+            self.active_net = self.active_net.take(np.flatnonzero(keep))
+
+    def _sense(self, idxs):
+        """Traces every LIDAR fan and looks up checkpoints for `idxs` in one batch."""
+        self.profiler.count('rays', len(idxs) * self.sensors.num_rays)
+        self.sensors.refresh(idxs)
+
+    def _act(self, live, rays, dists, angs):
+        """
+        Runs the networks of the cars at `live` in one batched pass on their
+        LIDAR `rays` and next-checkpoint distance/bearing, sets the fleet's
+        inputs and adds the wall-avoidance reward.
+        """
+        fleet = self.fleet
+
+        # sense & act: rays, velocity, checkpoint distance & bearing, steer;
+        # `live` is the active set, in the same order as active_net's rows
+        inputs = np.column_stack([rays, fleet.velocity[live], dists, angs,
+                                  fleet.steer[live]])
+        out = self.active_net.activate(inputs)
+
+        thr = np.clip(out[:, 0], 0.0, 1.0)      # clamp throttle to [0, 1]
+        brk = np.clip(-out[:, 1], 0.0, 1.0)     # clamp brake to [0, 1]
+
+        steer_left_bool  = out[:, 2] > 0.5
+        steer_right_bool = out[:, 3] > 0.5
+        steer = np.where(steer_left_bool, out[:, 4] * fleet.max_steer, 0.0)
+        steer = steer - np.where(steer_right_bool, out[:, 5] * fleet.max_steer, 0.0)
+
+        fleet.throttle[live], fleet.brake_input[live], fleet.steer_target[live] = thr, brk, steer
+
+        # ── Wall‐avoidance bonus/penalty ──
+        # pick out left, center, right LIDAR beams
+        left_dist   = rays[:, 0]
+        center_dist = rays[:, rays.shape[1]//2]
+        right_dist  = rays[:, -1]
+        # see which side has more room
+        turning_away = (((left_dist > right_dist) & steer_right_bool)
+                        | ((right_dist > left_dist) & steer_left_bool))
+        bonus = np.where(turning_away, TURN_AWAY_REWARD * steer, -TURN_AWAY_PENALTY)
+        close = center_dist < self.warning_dist
+        for idx, b in zip(live[close].tolist(), bonus[close].tolist()):
+            self.fitness_scores[idx] += b
+
+    def _score_car(self, idx, dists, new_dist, dt):
+        """
+        Adds this step's shaped reward for a car that is still on track;
+        `new_dist` is its distance to the next checkpoint after the move.
+        """
+        car    = self.cars[idx]
+        steer  = car.steer_target
+        cp_idx = int(self.race.current_cp_idx[idx])
+
+        # compute fitness
+
+        # 1) proximity reward
+        self.fitness_scores[idx] += (self.prev_dists[idx] - new_dist) * PROXIMITY_SCALE
+        self.prev_dists[idx] = new_dist
+
+        # 2) idle penalty
+        if abs(car.velocity) < MAX_IDLE_SPEED:
+            self.fitness_scores[idx] -= IDLE_PENALTY_RATE * dt
+
+        # 3) lap bonus
+        if self.race.lap_count[idx] >= 1:
+            self.fitness_scores[idx] += LAP_BONUS
+
+        # 4) heading‐alignment bonus, along the track between current and next CP
+        if HEADING_SCALE and cp_idx < len(self.track.checkpoint_pixels):
+            heading_vec = np.array([math.cos(car.yaw), math.sin(car.yaw)])
+            p1, p2 = map(np.array, self.track.checkpoint_pixels[cp_idx])
+            tangent = (p2 - p1) / np.linalg.norm(p2 - p1)
+            dot = float(np.dot(heading_vec, tangent))
+            self.fitness_scores[idx] += max(dot, 0) * HEADING_SCALE
+
+        # 5) forward‐speed bonus
+        self.fitness_scores[idx] += max(car.velocity, 0) * SPEED_SCALE
+
+        # 6) wall‐proximity penalty via LIDAR
+        min_d = dists.min()
+        if min_d < self.wall_thresh:
+            self.fitness_scores[idx] -= (self.wall_thresh - min_d) * WALL_SCALE
+
+        # 7) small bonus the moment you cross a checkpoint
+        if cp_idx > self.last_cp_idxs[idx]:
+            self.fitness_scores[idx] += CHECKPOINT_BONUS
+            self.last_cp_idxs[idx] = cp_idx
+
+        # 8) steering penalty
+        self.fitness_scores[idx] -= abs(steer) * STEER_PENALTY * dt
+        self.fitness_scores[idx] += (1.0 - abs(steer)) * STRAIGHT_BONUS * dt
+
+    def run(self, generation_time, dt):
+        """Steps with a fixed `dt` until `generation_time` seconds are simulated."""
+        while self.elapsed < generation_time:
+            if not self.step(dt):
+                print(">> All cars retired or idle—ending generation early")
+                break
+
+    def assign_fitness(self, verbose=True):
+        for i, genome in enumerate(self.genomes):
+            genome.fitness = self.fitness_scores[i]
+            if verbose:
+                print(f"Genome {i} fitness: {genome.fitness:.1f}")
+
+
+# — multi-process evaluation —
+
+# per-worker state, filled in by _init_worker
+_worker = {}
+
+
+def _share_array(array):
+    """Copies `array` into a new SharedMemory block; returns (shm, spec)."""
+    shm = shared_memory.SharedMemory(create=True, size=array.nbytes)
+    np.ndarray(array.shape, array.dtype, buffer=shm.buf)[:] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def _attach_array(spec):
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, np.dtype(dtype), buffer=shm.buf)
+
+
+def _init_worker(track_name, terrain_spec, field_spec, config, generation_time, dt,
+                 stall_window, stop_when_idle):
+    # parse the track file for the geometry, but map the compiled data read-only
+    track = Track(track_name, build_terrain=False)
+    terrain_shm, track.terrain = _attach_array(terrain_spec)
+    field_shm, track.distance_field = _attach_array(field_spec)
+    track.terrain.flags.writeable = False
+    track.distance_field.flags.writeable = False
+    _worker.update(track=track, config=config, shms=(terrain_shm, field_shm),
+                   generation_time=generation_time, dt=dt, stall_window=stall_window,
+                   stop_when_idle=stop_when_idle)
+
+
+def _evaluate_shard(genomes):
+    sim = GenerationSim(_worker['track'], genomes, _worker['config'],
+                        stall_window=_worker['stall_window'],
+                        stop_when_idle=_worker['stop_when_idle'])
+    sim.run(_worker['generation_time'], _worker['dt'])
+    return sim.fitness_scores
+
+
+class ParallelEvaluator:
+    """
+    Evaluates a generation's genomes on a pool of worker processes.
+
+    The track's terrain map and distance field are copied once into shared
+    memory and mapped read-only by every worker, so tasks only carry the
+    genomes. Each shard runs its own GenerationSim (cars never interact in
+    training) and the fitness values come back to the parent, ready for
+    pop.reproduction.reproduce. A shard ends early once all of its cars
+    are retired, which can't change anyone's fitness, so the scores match a
+    serial GenerationSim for any number of workers. `stop_when_idle` is
+    passed on to every shard's GenerationSim; each shard then stops on its
+    own idle check, and fitness comes to depend on how genomes are sharded.
+
+    Use as a context manager, or call close() to stop the pool and free the
+    shared memory.
+    """
+    def __init__(self, track, config, generation_time, dt, num_workers=None,
+                 stall_window=STALL_WINDOW, stop_when_idle=False):
+        self.num_workers = num_workers or os.cpu_count()
+        terrain_shm, terrain_spec = _share_array(track.terrain)
+        field_shm, field_spec     = _share_array(track.distance_field)
+        self._shms = (terrain_shm, field_shm)
+        self.pool = multiprocessing.Pool(
+            self.num_workers, _init_worker,
+            (track.name, terrain_spec, field_spec, config, generation_time, dt,
+             stall_window, stop_when_idle)
+        )
+
+    def evaluate(self, genomes, verbose=True):
+        """Sets genome.fitness on every genome in `genomes`."""
+        # a few shards per worker evens out generations that end early
+        n_shards = min(len(genomes), self.num_workers * 4)
+        shards = [genomes[i::n_shards] for i in range(n_shards)]
+        results = self.pool.map(_evaluate_shard, shards)
+
+        for shard, scores in zip(shards, results):
+            for genome, fitness in zip(shard, scores):
+                genome.fitness = fitness
+        if verbose:
+            for i, genome in enumerate(genomes):
+                print(f"Genome {i} fitness: {genome.fitness:.1f}")
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        for shm in self._shms:
+            shm.close()
+            shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,249 @@
+"""
+Compiled terrain maps.
+
+A terrain map is a 2-D uint8 NumPy array, indexed [y, x] like the screen,
+holding one TERRAIN_* class per pixel. It is built once per track from the
+tile sheet and the track's blocks, so sensors can index it directly instead
+of calling Surface.get_at on a rendered track.
+"""
+import math
+
+import numpy as np
+import pygame
+
+# Terrain‐sensor colors, as painted in TrackPieces.png
+GRASS_COLOR    = (  0,200,  0)   # off‐road grass
+SAND_COLOR     = (255,255,  0)   # yellow = sand
+GRAVEL_COLOR   = (  0,  0,  0)   # black = gravel
+CURB_BLUE_COLOR= (  0,  0,255)   # blue = slight curb
+WALL_COLOR     = (255,  0,  0)   # red = wall
+
+# Terrain classes
+TERRAIN_ROAD       = 0
+TERRAIN_CURB       = 1
+TERRAIN_GRASS      = 2
+TERRAIN_GRAVEL     = 3
+TERRAIN_SAND       = 4
+TERRAIN_WALL       = 5
+TERRAIN_CHECKPOINT = 6   # finish line and checkpoint overlays (drive like road)
+
+# what a LIDAR ray stops on: grass or wall
+IS_OBSTACLE = np.zeros(256, dtype=bool)
+IS_OBSTACLE[[TERRAIN_GRASS, TERRAIN_WALL]] = True
+
+# how far past a pixel boundary a traced ray is put, so that it lands in
+# the next pixel despite rounding (pixels)
+TRACE_EPS = 1e-6
+
+_COLOR_CLASSES = [
+    (GRASS_COLOR,     TERRAIN_GRASS),
+    (SAND_COLOR,      TERRAIN_SAND),
+    (GRAVEL_COLOR,    TERRAIN_GRAVEL),
+    (CURB_BLUE_COLOR, TERRAIN_CURB),
+    (WALL_COLOR,      TERRAIN_WALL),
+]
+
+
+def classify_pixels(rgb):
+    """
+    Maps an (..., 3) RGB array to terrain classes. Only exact color matches
+    count; anything else (grey tarmac, anti-aliasing) is road.
+    """
+    classes = np.full(rgb.shape[:-1], TERRAIN_ROAD, dtype=np.uint8)
+    for color, cls in _COLOR_CLASSES:
+        classes[(rgb == color).all(axis=-1)] = cls
+    return classes
+
+
+def tile_class_maps(sheet, tile_w, tile_h):
+    """
+    Slices the 3×3 tile sheet the same way as RacingAI.road_tiles and returns
+    one [y, x] class array per tile.
+    """
+    rgb = pygame.surfarray.array3d(sheet).transpose(1, 0, 2)
+    return [
+        classify_pixels(rgb[row*tile_h:(row+1)*tile_h, col*tile_w:(col+1)*tile_w])
+        for row in range(3) for col in range(3)
+    ]
+
+
+def compile_terrain(track, tile_maps):
+    """
+    Builds the terrain map for `track`: grass background, each block's tile
+    scaled to block_size and rotated like Track.draw does, then the finish
+    line and checkpoint segments on top.
+    """
+    width, height = track.get_screen_size()
+    bs = track.block_size
+    terrain = np.full((height, width), TERRAIN_GRASS, dtype=np.uint8)
+
+    # nearest-neighbour scale and 90° rotations match pygame.transform exactly
+    scaled = {}
+    for x, y, idx, rot in track.blocks:
+        k = (rot // 90) % 4
+        if (idx, k) not in scaled:
+            src = tile_maps[idx]
+            rows = np.arange(bs) * src.shape[0] // bs
+            cols = np.arange(bs) * src.shape[1] // bs
+            scaled[idx, k] = np.rot90(src[rows][:, cols], k)
+        tile = scaled[idx, k]
+
+        # same centring (and rounding) as Track.draw's get_rect(center=...)
+        rect = pygame.Rect(0, 0, bs, bs)
+        rect.center = (x * bs + bs/2, y * bs + bs/2)
+        x0, y0 = max(rect.left, 0), max(rect.top, 0)
+        x1, y1 = min(rect.right, width), min(rect.bottom, height)
+        if x0 < x1 and y0 < y1:
+            terrain[y0:y1, x0:x1] = tile[y0-rect.top:y1-rect.top, x0-rect.left:x1-rect.left]
+
+    # finish + checkpoint overlays, rasterised with the same pygame.draw.line
+    lines = []
+    if len(track.finish_line) == 2:
+        lines.append(track.finish_line)
+    lines.extend(track.checkpoint_lines)
+    if lines:
+        mask = pygame.Surface((width, height))
+        for (x1, y1), (x2, y2) in lines:
+            p1 = (x1*bs + bs//2, y1*bs + bs//2)
+            p2 = (x2*bs + bs//2, y2*bs + bs//2)
+            pygame.draw.line(mask, (255, 255, 255), p1, p2, max(1, bs//10))
+        terrain[pygame.surfarray.array2d(mask).T != 0] = TERRAIN_CHECKPOINT
+
+    return terrain
+
+
+def cast_lidar(terrain, xs, ys, yaws, num_rays=5, fov=math.pi, max_dist=100.0,
+               step=4, chunk=256):
+    """
+    Batched Car.get_lidar: casts the same `num_rays` fan for every car at
+    once. xs, ys, yaws are length-N sequences (pixels, radians); returns an
+    (N, num_rays) array of distances normalised to [0..1].
+
+    Each ray is sampled every `step` pixels from the car outwards and stops
+    at the first sample that is off the map or on an obstacle, exactly like
+    the per-car loop did. Cars are processed `chunk` at a time to bound the
+    size of the (cars × rays × samples) work arrays.
+    """
+    xs   = np.asarray(xs,   dtype=np.float64)
+    ys   = np.asarray(ys,   dtype=np.float64)
+    yaws = np.asarray(yaws, dtype=np.float64)
+    height, width = terrain.shape
+
+    offsets = fan_offsets(num_rays, fov)
+    n_samples = max(1, math.ceil(max_dist / step))
+    dists   = np.arange(n_samples) * step
+
+    out = np.empty((len(xs), num_rays))
+    for start in range(0, len(xs), chunk):
+        end = start + chunk
+        angles = yaws[start:end, None] + offsets                    # (n, R)
+        px = np.trunc(xs[start:end, None, None]
+                      + dists * np.cos(angles)[..., None]).astype(np.intp)
+        py = np.trunc(ys[start:end, None, None]
+                      + dists * np.sin(angles)[..., None]).astype(np.intp)
+
+        inside = (px >= 0) & (px < width) & (py >= 0) & (py < height)
+        cls = terrain[np.clip(py, 0, height-1), np.clip(px, 0, width-1)]
+        stop = ~inside | IS_OBSTACLE[cls]
+
+        # index of the first stopping sample, or n_samples if none
+        first = np.where(stop.any(axis=-1), stop.argmax(axis=-1), n_samples)
+        out[start:end] = np.minimum(first * step, max_dist) / max_dist
+    return out
+
+
+def distance_field(terrain):
+    """
+    Exact Euclidean distance, in pixels, from every pixel centre to the
+    nearest obstacle (grass or wall) pixel centre, as a float32 [y, x] array.
+    The map edge counts as an obstacle so rays can't be traced past it.
+
+    Two separable passes: the horizontal distance per row, then for each dy
+    the best of (row distance at y±dy)² + dy², stopping once dy² exceeds the
+    largest distance left to improve.
+    """
+    height, width = terrain.shape
+    blocked = np.ones((height + 2, width + 2), dtype=bool)
+    blocked[1:-1, 1:-1] = IS_OBSTACLE[terrain]
+
+    # 1) distance along each row to the nearest blocked pixel
+    cols = np.arange(width + 2)
+    left = np.where(blocked, cols, -(width + 2))
+    left = np.maximum.accumulate(left, axis=1)
+    right = np.where(blocked, cols, 2 * (width + 2))
+    right = np.minimum.accumulate(right[:, ::-1], axis=1)[:, ::-1]
+    row_sq = np.minimum(cols - left, right - cols).astype(np.int64) ** 2
+
+    # 2) combine rows
+    best = row_sq.copy()
+    dy = 1
+    while dy * dy < best.max():
+        cand = row_sq[dy:] + dy * dy
+        np.minimum(best[:-dy], cand, out=best[:-dy])
+        np.minimum(best[dy:], row_sq[:-dy] + dy * dy, out=best[dy:])
+        dy += 1
+
+    return np.sqrt(best[1:-1, 1:-1]).astype(np.float32)
+
+
+def fan_offsets(num_rays, fov):
+    """Ray angles of a LIDAR fan relative to the car's yaw, left to right."""
+    half = fov / 2
+    return -half + fov * np.arange(num_rays) / (num_rays - 1)
+
+
+def trace_lidar(terrain, field, xs, ys, yaws, num_rays=5, fov=math.pi,
+                max_dist=100.0):
+    """
+    Sphere-traced version of cast_lidar, same arguments and result minus
+    `step`. Each ray jumps ahead by the distance `field` (see
+    distance_field) guarantees to be clear, or to where it leaves its
+    current pixel if that is further, so open straights take a handful of
+    lookups, a ray grazing a wall walks it pixel by pixel, and every
+    reading is where the ray first enters an obstacle pixel (or leaves the
+    map) without slipping past any corner.
+    """
+    return trace_rays(terrain, field, xs, ys, yaws, fan_offsets(num_rays, fov), max_dist)
+
+
+def trace_rays(terrain, field, xs, ys, yaws, offsets, max_dist=100.0):
+    """
+    trace_lidar for any set of ray angles: `offsets` (radians from each
+    car's yaw) can hold several fans back to back, which are then traced
+    in the one batch. Returns an (N, len(offsets)) array in [0..1].
+    """
+    xs   = np.asarray(xs,   dtype=np.float64)
+    ys   = np.asarray(ys,   dtype=np.float64)
+    yaws = np.asarray(yaws, dtype=np.float64)
+    height, width = terrain.shape
+
+    num_rays = len(offsets)
+    angles  = (yaws[:, None] + offsets).ravel()
+    ox = np.repeat(xs, num_rays)
+    oy = np.repeat(ys, num_rays)
+    dx, dy = np.cos(angles), np.sin(angles)
+    with np.errstate(divide='ignore'):
+        inv_dx, inv_dy = 1.0 / np.abs(dx), 1.0 / np.abs(dy)
+
+    dist = np.zeros(len(angles))
+    active = np.arange(len(angles))
+    while len(active):
+        t = dist[active]
+        x = ox[active] + t * dx[active]
+        y = oy[active] + t * dy[active]
+        px = np.floor(x).astype(np.intp)
+        py = np.floor(y).astype(np.intp)
+        inside = (px >= 0) & (px < width) & (py >= 0) & (py < height)
+        cx, cy = np.clip(px, 0, width-1), np.clip(py, 0, height-1)
+        keep = inside & ~IS_OBSTACLE[terrain[cy, cx]] & (t < max_dist)
+        active, t, x, y, px, py = (a[keep] for a in (active, t, x, y, px, py))
+
+        # clear of obstacles for field - √2 whichever way (the ray point
+        # and the nearest obstacle's centre are each up to √2/2 from their
+        # pixel centres), and still in this pixel up to where it leaves it
+        clear = field[py, px] - math.sqrt(2)
+        exit_x = np.where(dx[active] >= 0, px + 1 - x, x - px) * inv_dx[active]
+        exit_y = np.where(dy[active] >= 0, py + 1 - y, y - py) * inv_dy[active]
+        dist[active] = t + np.maximum(clear, np.minimum(exit_x, exit_y) + TRACE_EPS)
+
+    return (np.minimum(dist, max_dist) / max_dist).reshape(len(xs), num_rays)
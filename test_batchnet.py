@@ -0,0 +1,68 @@
+"""
+BatchNetwork against neat-python's FeedForwardNetwork.
+
+Genomes are built from config-feedforward.ini and mutated a few dozen
+times each, so they pick up hidden nodes, disabled and deleted links and
+every activation the config allows. Run with `python -m pytest test_batchnet.py`.
+"""
+import os
+import random
+
+import neat
+import numpy as np
+
+from batchnet import BatchNetwork, compile_genome
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'config-feedforward.ini')
+
+
+def _genomes(count=40, mutations=30, seed=0):
+    random.seed(seed)
+    config = neat.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                         neat.DefaultSpeciesSet, neat.DefaultStagnation, CONFIG_PATH)
+    genomes = []
+    for key in range(count):
+        genome = config.genome_type(key)
+        genome.configure_new(config.genome_config)
+        for _ in range(random.randrange(mutations + 1)):
+            genome.mutate(config.genome_config)
+        genomes.append(genome)
+    return genomes, config
+
+
+def _inputs(genomes, config, rng):
+    # roughly what the cars feed in (rays and speeds in [0..1], angles in
+    # ±π), with some values well outside to reach the activation clipping
+    return rng.uniform(-4.0, 4.0, (len(genomes), config.genome_config.num_inputs))
+
+
+def test_batch_matches_feed_forward_network():
+    genomes, config = _genomes()
+    nets = [neat.nn.FeedForwardNetwork.create(g, config) for g in genomes]
+    batch = BatchNetwork.from_genomes(genomes, config)
+    rng = np.random.default_rng(0)
+    for _ in range(5):
+        inputs = _inputs(genomes, config, rng)
+        expected = np.array([net.activate(row) for net, row in zip(nets, inputs)])
+        np.testing.assert_allclose(batch.activate(inputs), expected, rtol=0, atol=1e-12)
+
+
+def test_take_keeps_each_genomes_network():
+    genomes, config = _genomes()
+    batch = BatchNetwork.from_genomes(genomes, config)
+    rows = np.arange(len(genomes))[::3]
+    inputs = _inputs(genomes, config, np.random.default_rng(1))
+    np.testing.assert_allclose(batch.take(rows).activate(inputs[rows]),
+                               batch.activate(inputs)[rows], rtol=0, atol=1e-12)
+
+
+def test_compiled_network_matches_feed_forward_network():
+    genomes, config = _genomes(count=10)
+    rng = np.random.default_rng(2)
+    for genome in genomes:
+        net = neat.nn.FeedForwardNetwork.create(genome, config)
+        compiled = compile_genome(genome, config)
+        row = _inputs([genome], config, rng)[0]
+        np.testing.assert_allclose(compiled.activate(row), net.activate(row),
+                                   rtol=0, atol=1e-12)
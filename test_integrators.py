@@ -0,0 +1,24 @@
+"""
+Accuracy of the integrators in integrators.py against a fine-step reference.
+
+A fleet of cars drives the same random throttle / brake / steering script
+with each integrator, and their positions are compared with rk4 at a very
+small step (see integrators.trajectory_error). Run with `python -m pytest test_integrators.py`.
+"""
+from integrators import ARC, EULER, RK4, trajectory_error
+
+
+def test_error_shrinks_with_dt():
+    for integrator in (EULER, ARC, RK4):
+        errors = [trajectory_error(integrator, 1.0 / hz) for hz in (30, 60, 120)]
+        assert errors[0] > errors[1] > errors[2], (integrator, errors)
+
+
+def test_arc_at_a_quarter_rate_beats_euler():
+    # arc at a 4× longer step (1/30 s) still tracks the reference more
+    # closely than euler does at 1/120 s
+    assert trajectory_error(ARC, 1.0 / 30) < trajectory_error(EULER, 1.0 / 120)
+
+
+def test_rk4_at_a_quarter_rate_beats_euler():
+    assert trajectory_error(RK4, 1.0 / 30) < trajectory_error(EULER, 1.0 / 120)
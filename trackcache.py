@@ -0,0 +1,95 @@
+"""
+On-disk cache of data derived from a track.
+
+Each entry lives in track_cache/<key>/ as plain .npy files: the terrain map,
+its distance field and the rendered track image. The key is a hash of the
+track file, the tile sheet and the render parameters, so editing the track
+or TrackPieces.png just produces a new key and the entry is rebuilt on the
+next load. Arrays come back memory-mapped read-only, so a warm start (a new
+training run, a worker process) costs a few file opens instead of a
+re-render.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), 'track_cache')
+
+# bump when the way terrain / fields / renders are built changes, so stale
+# entries from older code are never picked up
+CACHE_VERSION = 1
+
+_file_hashes = {}   # (path, mtime, size) -> sha256 hex, per process
+
+
+def _hash_file(path):
+    stat = os.stat(path)
+    sig = (path, stat.st_mtime_ns, stat.st_size)
+    digest = _file_hashes.get(sig)
+    if digest is None:
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        _file_hashes[sig] = digest
+    return digest
+
+
+class TrackCache:
+    def __init__(self, root=CACHE_DIR):
+        self.root = root
+
+    def key(self, files, **params):
+        """
+        Content key for the data built from `files` with `params`. Only file
+        contents count, not names or paths, so a renamed track still hits.
+        """
+        h = hashlib.sha256(f"v{CACHE_VERSION}".encode())
+        for path in files:
+            h.update(_hash_file(path).encode())
+        for name in sorted(params):
+            h.update(f"|{name}={params[name]!r}".encode())
+        return h.hexdigest()[:32]
+
+    def load(self, key, name):
+        """The cached array, memory-mapped read-only, or None."""
+        path = os.path.join(self.root, key, name + '.npy')
+        try:
+            array = np.load(path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        # a plain ndarray view of the same pages; np.memmap's own indexing
+        # is much slower for the scalar lookups in the sensor loops
+        return array.view(np.ndarray)
+
+    def save(self, key, name, array):
+        """
+        Stores `array`. Written to a temp file and renamed into place, so
+        processes building the same entry at once never see half a file.
+        Failures (read-only checkout, full disk) are reported, not raised.
+        """
+        folder = os.path.join(self.root, key)
+        try:
+            os.makedirs(folder, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=folder, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(tmp, os.path.join(folder, name + '.npy'))
+        except OSError as e:
+            print(f"Track cache not written ({e})")
+
+    def get(self, key, name, build):
+        """load(key, name), or build() it and save it first."""
+        array = self.load(key, name)
+        if array is None:
+            array = build()
+            self.save(key, name, array)
+        return array
+
+    def clear(self):
+        """Deletes every cached entry."""
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+default_cache = TrackCache()
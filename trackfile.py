@@ -0,0 +1,221 @@
+"""
+Track files on disk.
+
+Tracks come in two formats holding the same data:
+
+  .csv  the human-readable format the editor has always written: the grid
+        size, then 'spawn' / 'finish' / 'checkpoint' rows, then one
+        x,y,tile,rotation row per block.
+  .trk  a compact binary format for big generated tracks and for loading
+        many tracks per training run:
+
+          header      <4sBBHH  magic b'OATK', version, flags, grid size,
+                               number of checkpoints
+          spawn       <hh      (only if flags & HAS_SPAWN)
+          finish      <hhhh    (only if flags & HAS_FINISH)
+          checkpoints <hhhh    × number of checkpoints
+          tiles       uint8    grid × grid, row-major [y, x]; 255 = empty
+          rotations   uint8    grid × grid, degrees // 90
+
+The binary file is memory-mapped and the tile arrays read with
+np.frombuffer, so a 200×200 track loads without any per-block parsing.
+Run `python trackfile.py tracks/foo.csv tracks/foo.trk` (or the other way
+round) to convert; the round trip is lossless.
+"""
+import csv
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+TRACK_MAGIC   = b'OATK'
+TRACK_VERSION = 1
+HAS_SPAWN  = 1
+HAS_FINISH = 2
+EMPTY_TILE = 255
+
+_HEADER = struct.Struct('<4sBBHH')
+_POINT  = struct.Struct('<hh')
+_LINE   = struct.Struct('<hhhh')
+
+
+class TrackData:
+    """
+    Everything stored in a track file. Blocks are (x, y, tile, rotation)
+    tuples in row-major order, the order the editor writes them.
+    """
+    def __init__(self, grid_size, blocks=(), spawn_point=None, finish_line=None,
+                 checkpoint_lines=()):
+        self.grid_size        = grid_size
+        self.blocks           = list(blocks)
+        self.spawn_point      = spawn_point                 # (x, y) or None
+        self.finish_line      = finish_line or []           # [(x1,y1), (x2,y2)] or []
+        self.checkpoint_lines = list(checkpoint_lines)      # [((x1,y1), (x2,y2)), ...]
+
+    def __eq__(self, other):
+        return (isinstance(other, TrackData)
+                and self.grid_size == other.grid_size
+                and self.blocks == other.blocks
+                and self.spawn_point == other.spawn_point
+                and self.finish_line == other.finish_line
+                and self.checkpoint_lines == other.checkpoint_lines)
+
+
+def find_track_file(path):
+    """
+    Resolves a track path that may leave off the extension. If both a .csv
+    and a .trk exist, the more recently modified one wins, so a hand-edited
+    CSV isn't shadowed by an old binary copy.
+    """
+    if os.path.splitext(path)[1] in ('.csv', '.trk'):
+        return path
+    found = [p for p in (path + '.csv', path + '.trk') if os.path.exists(p)]
+    if not found:
+        return path + '.csv'
+    return max(found, key=os.path.getmtime)
+
+
+def read_track(path):
+    """Reads a .csv or .trk track file into a TrackData."""
+    if path.endswith('.trk'):
+        return read_track_bin(path)
+    return read_track_csv(path)
+
+
+def write_track(path, data):
+    """Writes `data` as .trk or .csv, by the extension of `path`."""
+    if path.endswith('.trk'):
+        write_track_bin(path, data)
+    else:
+        write_track_csv(path, data)
+
+
+def read_track_csv(path):
+    with open(path, 'r') as file:
+        reader = csv.reader(file)
+        data = TrackData(int(next(reader)[0]))
+
+        for row in reader:
+            if not row:
+                continue
+            tag = row[0]
+            if tag == 'spawn':
+                data.spawn_point = (int(row[1]), int(row[2]))
+            elif tag == 'finish':
+                x1, y1, x2, y2 = map(int, row[1:])
+                data.finish_line = [(x1, y1), (x2, y2)]
+            elif tag == 'checkpoint':
+                x1, y1, x2, y2 = map(int, row[1:])
+                data.checkpoint_lines.append(((x1, y1), (x2, y2)))
+            else:
+                x, y, idx, rot = map(int, row)
+                data.blocks.append((x, y, idx, rot))
+    return data
+
+
+def write_track_csv(path, data):
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow([data.grid_size])
+
+        if data.spawn_point:
+            writer.writerow(['spawn', *data.spawn_point])
+        if len(data.finish_line) == 2:
+            (x1, y1), (x2, y2) = data.finish_line
+            writer.writerow(['finish', x1, y1, x2, y2])
+        for (x1, y1), (x2, y2) in data.checkpoint_lines:
+            writer.writerow(['checkpoint', x1, y1, x2, y2])
+
+        for x, y, idx, rot in data.blocks:
+            writer.writerow([x, y, idx, rot])
+
+
+def read_track_bin(path):
+    with open(path, 'rb') as file, \
+         mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        magic, version, flags, grid, n_cps = _HEADER.unpack_from(buf, 0)
+        if magic != TRACK_MAGIC:
+            raise ValueError(f"{path} is not a .trk track file")
+        if version != TRACK_VERSION:
+            raise ValueError(f"{path}: unsupported .trk version {version}")
+        offset = _HEADER.size
+
+        data = TrackData(grid)
+        if flags & HAS_SPAWN:
+            data.spawn_point = _POINT.unpack_from(buf, offset)
+            offset += _POINT.size
+        if flags & HAS_FINISH:
+            x1, y1, x2, y2 = _LINE.unpack_from(buf, offset)
+            data.finish_line = [(x1, y1), (x2, y2)]
+            offset += _LINE.size
+        for _ in range(n_cps):
+            x1, y1, x2, y2 = _LINE.unpack_from(buf, offset)
+            data.checkpoint_lines.append(((x1, y1), (x2, y2)))
+            offset += _LINE.size
+
+        # views straight onto the mapping; only the placed cells are copied out
+        cells = grid * grid
+        tiles = np.frombuffer(buf, np.uint8, cells, offset).reshape(grid, grid)
+        rots  = np.frombuffer(buf, np.uint8, cells, offset + cells).reshape(grid, grid)
+        ys, xs = np.nonzero(tiles != EMPTY_TILE)
+        data.blocks = list(zip(xs.tolist(), ys.tolist(),
+                               tiles[ys, xs].tolist(),
+                               (rots[ys, xs].astype(np.int32) * 90).tolist()))
+        # the views must go before the mapping can close
+        del tiles, rots
+    return data
+
+
+def write_track_bin(path, data):
+    """
+    Raises ValueError for anything the binary format can't hold exactly:
+    blocks off the grid or stacked on one cell, tile indices ≥ 255, and
+    rotations that aren't 0/90/180/270.
+    """
+    grid  = data.grid_size
+    tiles = np.full((grid, grid), EMPTY_TILE, dtype=np.uint8)
+    rots  = np.zeros((grid, grid), dtype=np.uint8)
+    for x, y, idx, rot in data.blocks:
+        if not (0 <= x < grid and 0 <= y < grid):
+            raise ValueError(f"block ({x}, {y}) is outside the {grid}×{grid} grid")
+        if tiles[y, x] != EMPTY_TILE:
+            raise ValueError(f"more than one block at ({x}, {y})")
+        if not 0 <= idx < EMPTY_TILE:
+            raise ValueError(f"tile index {idx} doesn't fit in a .trk file")
+        if rot not in (0, 90, 180, 270):
+            raise ValueError(f"rotation {rot} isn't a multiple of 90 in [0, 360)")
+        tiles[y, x] = idx
+        rots[y, x]  = rot // 90
+
+    flags = ((HAS_SPAWN if data.spawn_point else 0)
+             | (HAS_FINISH if len(data.finish_line) == 2 else 0))
+    with open(path, 'wb') as file:
+        file.write(_HEADER.pack(TRACK_MAGIC, TRACK_VERSION, flags, grid,
+                                len(data.checkpoint_lines)))
+        if data.spawn_point:
+            file.write(_POINT.pack(*data.spawn_point))
+        if len(data.finish_line) == 2:
+            (x1, y1), (x2, y2) = data.finish_line
+            file.write(_LINE.pack(x1, y1, x2, y2))
+        for (x1, y1), (x2, y2) in data.checkpoint_lines:
+            file.write(_LINE.pack(x1, y1, x2, y2))
+        file.write(tiles.tobytes())
+        file.write(rots.tobytes())
+
+
+def convert_track(src, dst):
+    """
+    Converts between .csv and .trk. Binary files always list blocks in
+    row-major order, which is how the editor saves them too.
+    """
+    write_track(dst, read_track(src))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: python trackfile.py <src.csv|src.trk> <dst.csv|dst.trk>")
+        sys.exit(1)
+    convert_track(sys.argv[1], sys.argv[2])
+    print(f"Converted '{sys.argv[1]}' -> '{sys.argv[2]}'")
@@ -1,46 +1,204 @@
-import pygame, sys, os, math, random
-from RacingAI import Track, Car, compute_spawns, ASSETS_DIR, TRACK_DIR
-from RacingAI import default_font as _unused  # ensure font code is present
-from RacingAI import RaceManager
-from RacingAI import get_text_input, default_font  # for the popup prompt :contentReference[oaicite:1]{index=1}
+import pygame, sys, os, math, time
+from RacingAI import Track, TRACK_DIR
+from RacingAI import get_text_input  # for the popup prompt
 import RacingAI
-import numpy as np
 import pickle
 
 import neat
-from neat.nn import FeedForwardNetwork
+
+from simulation import GenerationSim, ParallelEvaluator
+from profiler import FrameProfiler
 
 AI_SAVEPATH = os.path.join(os.path.dirname(__file__), 'ai_saves')
 
+# viewing modes, cycled with T: one physics step per frame at `fps`, every
+# Nth step drawn (still paced to `fps`, so N× real time), or turbo
+VIEW_REALTIME = 0
+VIEW_SKIP     = 1
+VIEW_TURBO    = 2
+VIEW_NAMES    = ["real-time", "every Nth step", "turbo"]
+# in turbo the sim runs flat out and the window repaints this often (seconds)
+TURBO_REPAINT = 0.25
+
+
+class TrainingViewer:
+    """
+    Optional pygame window attached to a GenerationSim. Draws the cars and
+    HUD and handles the S (save) / L (load) population hotkeys, T / + / -
+    for the viewing mode and step skip, R for the cars' LIDAR rays, plus
+    F3/F4 for the frame profiler's overlay and CSV export.
+    """
+    def __init__(self, track, track_surf, font):
+        self.track_surf = track_surf
+        self.font       = font
+        self.screen     = pygame.display.set_mode(track.get_screen_size())
+        self.profiler   = FrameProfiler()
+        self.overlay_font = pygame.font.Font(None, 20)
+        self.view_mode  = VIEW_REALTIME
+        self.skip       = 4              # steps per frame in VIEW_SKIP
+        self.show_rays  = False
+        pygame.display.set_caption("Live GA Training")
+
+    @property
+    def paced(self):
+        """Whether frames should be limited to the target fps."""
+        return self.view_mode != VIEW_TURBO
+
+    def advance(self, sim, dt, generation_time):
+        """
+        Steps `sim` for one drawn frame: 1 step in real-time mode, `skip`
+        steps when skipping, and as many as fit in TURBO_REPAINT seconds in
+        turbo. Returns False once the generation is over early (see
+        GenerationSim.step).
+        """
+        if self.view_mode == VIEW_TURBO:
+            steps, deadline = math.inf, time.perf_counter() + TURBO_REPAINT
+        else:
+            steps, deadline = (1 if self.view_mode == VIEW_REALTIME else self.skip), None
+
+        done = 0
+        while done < steps and sim.elapsed < generation_time:
+            if not sim.step(dt):
+                return False
+            done += 1
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+        return True
+
+    def handle_events(self, pop):
+        """
+        Pumps the event queue. Returns a freshly loaded Population if the user
+        pressed L and the file exists, otherwise None.
+        """
+        for ev in pygame.event.get():
+            if ev.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+            elif ev.type == pygame.KEYDOWN:
+                if ev.key == pygame.K_s:
+                    # Prompt for save filename
+                    box = pygame.Rect(self.screen.get_width()//2 - 150,
+                                      self.screen.get_height()//2 - 20,
+                                      300, 40)
+                    fname = get_text_input(self.screen, "Enter save file name: ",
+                                           self.font, box)
+                    if fname:
+                        full_path = os.path.join(AI_SAVEPATH, fname + '.pkl')
+                        with open(full_path, 'wb') as f:
+                            pickle.dump(pop, f)
+                        print(f"Saved population to '{full_path}'")
+
+                elif ev.key == pygame.K_l:
+                    # Prompt for load filename
+                    box = pygame.Rect(self.screen.get_width()//2 - 150,
+                                      self.screen.get_height()//2 - 20,
+                                      300, 40)
+                    fname = get_text_input(self.screen, "Enter load file name: ",
+                                           self.font, box)
+                    if fname:
+                        full_path = os.path.join(AI_SAVEPATH, fname + '.pkl')
+                        try:
+                            with open(full_path, 'rb') as f:
+                                loaded = pickle.load(f)
+                            print(f"Loaded population from '{full_path}'")
+                            return loaded
+                        except FileNotFoundError:
+                            print(f"No saved population found at '{full_path}'")
+                elif ev.key == pygame.K_t:
+                    self.view_mode = (self.view_mode + 1) % len(VIEW_NAMES)
+                elif ev.key == pygame.K_r:
+                    self.show_rays = not self.show_rays
+                elif ev.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):
+                    self.skip = min(self.skip * 2, 1024)
+                elif ev.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                    self.skip = max(self.skip // 2, 2)
+                else:
+                    self.profiler.handle_key(ev.key)
+        return None
+
+    def draw(self, sim, generation, elapsed, generation_time):
+        screen = self.screen
+        prof   = self.profiler
+        screen.blit(self.track_surf, (0,0))
+        prof.lap('track')
+
+        # the network's LIDAR fan, straight from the step's sensor frame
+        if self.show_rays:
+            self.draw_rays(sim)
+
+        # draw numbered cars; crashed and retired ones are out of the running
+        for idx in sim.active.tolist():
+            car = sim.cars[idx]
+            idx += 1
+            # render the genome index in red, just above the car
+            num_surf = self.font.render(str(idx), True, (255, 0, 0))
+            label_rect = num_surf.get_rect(center=(car.x, car.y - car.height/2 - 10))
+            screen.blit(num_surf, label_rect)
+            car.draw(screen)
+        prof.lap('cars')
+
+        # HUD: gen + timer
+        txt = self.font.render(
+            f"Gen {generation}  Time {elapsed:.1f}/{generation_time}s", True, (0,0,0)
+        )
+        screen.blit(txt, (10,10))
+        screen.blit(self.font.render("S to save", True, (0,0,0)), (10,30))
+        screen.blit(self.font.render("L to load", True, (0,0,0)), (10,50))
+        view = VIEW_NAMES[self.view_mode]
+        if self.view_mode == VIEW_SKIP:
+            view = f"{self.skip} steps per frame (+/-)"
+        screen.blit(self.font.render(f"T view: {view}", True, (0,0,0)), (10,70))
+        screen.blit(self.font.render(f"R rays: {'on' if self.show_rays else 'off'}",
+                                     True, (0,0,0)), (10,90))
+        prof.draw_overlay(screen, self.overlay_font)
+        prof.lap('hud')
+
+        pygame.display.flip()
+        prof.lap('flip')
+
+    def draw_rays(self, sim):
+        """Each active car's 'net' fan as the network saw it, no re-casting."""
+        sensors, fleet = sim.sensors, sim.fleet
+        for idx in sim.active.tolist():
+            x, y = fleet.x[idx], fleet.y[idx]
+            reach = sensors.lidar('net', idx) * sensors.max_dist
+            for r, ang in zip(reach, sensors.fan_angles('net', idx)):
+                pygame.draw.line(self.screen, (0, 255, 0), (x, y),
+                                 (x + r * math.cos(ang), y + r * math.sin(ang)), 1)
+
+
 def main_visual_ga(track_name="test",
                    pop_size=20,
                    generation_time=30.0,
-                   fps=60):
+                   fps=60,
+                   headless=False,
+                   max_generations=None,
+                   workers=1):
+    """
+    Runs NEAT training on `track_name`. Physics always steps by 1/fps and
+    `generation_time` is measured in simulated seconds.
+    With headless=False a window shows every step paced to `fps`; with
+    headless=True no display is opened and generations run flat out,
+    sharded over `workers` processes when workers > 1.
+    """
     pygame.init()
-    pygame.font.init()
-    font = pygame.font.Font(None, 24)
 
-    # load track + window
-    track_path = os.path.join(TRACK_DIR, f'{track_name}.csv')
+    # load track
+    track_path = os.path.join(TRACK_DIR, track_name)   # .csv or .trk
     track = Track(track_path)
-    sx, sy = track.get_screen_size()
-    screen = pygame.display.set_mode((sx, sy))
-    pygame.display.set_caption("Live GA Training")
-    clock = pygame.time.Clock()
 
-    # prepare tiles & car sprite (same as ai_demo)
-    from RacingAI import road_tiles, CAR_IMAGE_RAW
-    if road_tiles is None:
-        raw = pygame.image.load(os.path.join(ASSETS_DIR, 'TrackPieces.png'))
-        sheet = raw.convert_alpha()
-        tw, th = sheet.get_width()//3, sheet.get_height()//3
-        RacingAI.road_tiles = [
-            sheet.subsurface(pygame.Rect(c*tw, r*th, tw, th)).copy()
-            for r in range(3) for c in range(3)
-        ]
-    if CAR_IMAGE_RAW is None:
-        raw_car = pygame.image.load(os.path.join(ASSETS_DIR, 'CarSprite.png'))
-        RacingAI.CAR_IMAGE_RAW = raw_car.convert_alpha()
+    # headless runs only need the terrain map compiled by Track
+    font = viewer = None
+    if not headless:
+        pygame.font.init()
+        font = pygame.font.Font(None, 24)
+        # opening the window first lets the tiles be converted for fast blits
+        pygame.display.set_mode(track.get_screen_size())
+        from RacingAI import road_tiles, CAR_IMAGE_RAW
+        if road_tiles is None or CAR_IMAGE_RAW is None:
+            RacingAI.load_assets()
+        viewer = TrainingViewer(track, track.get_static_layer(), font)
+    clock = pygame.time.Clock()
 
     # init NEAT
     cfg_path = os.path.join(os.path.dirname(__file__),
@@ -54,354 +212,86 @@ def main_visual_ga(track_name="test",
     pop.add_reporter(neat.StdOutReporter(True))
     pop.add_reporter(neat.StatisticsReporter())
 
-
     generation = 0
-
-    load_requested = False
-
-    while True:
-        generation += 1
-        print(f"Generation {generation}")
-        # spawn one Car+Controller+Manager for each genome
-        cars        = []
-        controllers = []
-        managers    = []
-        spawns = compute_spawns(track.spawn_point, pop_size, False, track)
-
-        # pull genomes out of pop.population (dict of {id:genome})
-        genome_list = list(pop.population.values())
-
-        for idx, genome in enumerate(genome_list):
-            x,y = spawns[idx]
-            cw,ch = track.get_car_size()
-            car = Car(x, y, cw, ch)
-            cars.append(car)
-            mgr = RaceManager(track, font)
-            managers.append(mgr)
-
-            net = FeedForwardNetwork.create(genome, config)
-            controllers.append(net)
-
-        # — initialize shaped‐reward bookkeeping —
-        crash_penalty     = 0
-        idle_penalty_rate = 0     # per second idling
-        proximity_scale   = 600.0    # per‐pixel reduction → reward
-        max_idle_speed    = 0.2      # below this, we call “idle”
-        lap_bonus         = 500000.0
-        HEADING_SCALE    = 0    # tune this
-        SPEED_SCALE      = 2
-        WALL_THRESH      = track.block_size * 0.3
-        WALL_SCALE       = 200.0
-        CHECKPOINT_BONUS = 200000.0
-        STEER_PENALTY = 0   # per radian per second
-        STRAIGHT_BONUS = 0.0
-
-        # how close is “too close” to the wall
-        WARNING_DIST      = track.block_size * 2
-        TURN_AWAY_REWARD  = 50.0
-        TURN_AWAY_PENALTY = 25.0
-
-
-
-        fitness_scores = [0.0] * len(genome_list)
-        prev_dists     = []
-        # record initial distance to next checkpoint for each car
-        for car, mgr in zip(cars, managers):
-            # print(f"Manager {mgr} for car {car}")
-            d, _ = mgr.get_next_checkpoint_info(car)
-            prev_dists.append(d)
-        
-        crashed        = [False] * len(genome_list)
-
-        # — extra bookkeeping —
-        last_cp_idxs = [mgr.current_cp_idx for mgr in managers]
-        last_positions = [(car.x, car.y) for car in cars]
-
-
-        start_ticks = pygame.time.get_ticks()
-        # run one generation
-        while (pygame.time.get_ticks() - start_ticks)/1000.0 < generation_time:
-            dt = clock.tick(fps) / 1000.0
-            for ev in pygame.event.get():
-                if ev.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                elif ev.type == pygame.KEYDOWN:
-                    if ev.key == pygame.K_s:
-                        # Prompt for save filename
-                        box = pygame.Rect(screen.get_width()//2 - 150,
-                                        screen.get_height()//2 - 20,
-                                        300, 40)
-                        fname = get_text_input(screen, "Enter save file name: ",
-                                            font, box)
-                        if fname:
-                            path = fname + '.pkl'
-                            full_path = os.path.join(AI_SAVEPATH, path)
-                            with open(full_path, 'wb') as f:
-                                pickle.dump(pop, f)
-                            print(f"Saved population to '{full_path}'")
-
-                    elif ev.key == pygame.K_l:
-                        # Prompt for load filename
-                        box = pygame.Rect(screen.get_width()//2 - 150,
-                                        screen.get_height()//2 - 20,
-                                        300, 40)
-                        fname = get_text_input(screen, "Enter load file name: ",
-                                            font, box)
-                        if fname:
-                            path = fname + '.pkl'
-                            full_path = os.path.join(AI_SAVEPATH, path)
-                            try:
-                                with open(full_path, 'rb') as f:
-                                    pop = pickle.load(f)
-                                print(f"Loaded population from '{full_path}'")
-                                load_requested = True
-                                break
-                            except FileNotFoundError:
-                                print(f"No saved population found at '{full_path}'")
-
-                            print("!! No population.pkl found")
-            
-            if load_requested:
-                break
-
-            # redraw track + lines into an offscreen surface
-            track_surf = pygame.Surface((sx, sy))
-            track_surf.fill((0,200,0))
-            track.draw(track_surf)
-            bs = track.block_size
-            if len(track.finish_line)==2:
-                (x1,y1),(x2,y2)=track.finish_line
-                p1=(x1*bs+bs//2,y1*bs+bs//2)
-                p2=(x2*bs+bs//2,y2*bs+bs//2)
-                pygame.draw.line(track_surf,(255,255,255),p1,p2,max(1,bs//10))
-            for (cx1,cy1),(cx2,cy2) in getattr(track,'checkpoint_lines',[]):
-                q1=(cx1*bs+bs//2,cy1*bs+bs//2)
-                q2=(cx2*bs+bs//2,cy2*bs+bs//2)
-                pygame.draw.line(track_surf,(255,165,0),q1,q2,max(1,bs//10))
-
-            # update each car
-            for idx, (car, ctrl, mgr) in enumerate(zip(cars, controllers, managers)):
-                # Skip if this car has crashed
-                if crashed[idx]:
-                    continue
-                # sense & act
-                ctrl.track_surface = track_surf
-
-                # `ctrl` is now a FeedForwardNetwork
-                # build the NN inputs exactly as before:
-                rays = car.get_lidar(track_surf, num_rays=11,
-                                     fov=math.pi*1,
-                                     max_dist=car.width*10, step=2)
-                
-                offtrack = 1.0 if car.Crr != car.Crr_normal else 0.0
-
-                dist, ang = mgr.get_next_checkpoint_info(car)
-                inputs = rays + [car.velocity, dist, ang, car.steer]
-                out    = ctrl.activate(inputs)
-
-                thr   = max(0.0, out[0])
-                thr = min(thr, 1.0)  # clamp throttle to [0, 1]
-                brk   = max(0.0, -out[1])
-                brk = min(brk, 1.0)  # clamp brake to [0, 1]
-                steer = 0
-
-                steer_left_bool = out[2] > 0.5
-                steer_right_bool = out[3] > 0.5
-
-                if steer_left_bool:
-                    steer += out[4] * car.max_steer
-                if steer_right_bool:
-                    steer -= out[5] * car.max_steer
-                    
-
-                car.throttle, car.brake_input, car.steer_target = thr, brk, steer
-
-                # ── Wall‐avoidance bonus/penalty ──
-                # pick out left, center, right LIDAR beams
-                left_dist   = rays[0]
-                center_dist = rays[len(rays)//2]
-                right_dist  = rays[-1]
-
-                if center_dist < WARNING_DIST:
-                    # see which side has more room
-                    if left_dist > right_dist and steer_right_bool:
-                        fitness_scores[idx] += TURN_AWAY_REWARD * steer
-                    elif right_dist > left_dist and steer_left_bool:
-                        fitness_scores[idx] += TURN_AWAY_REWARD * steer
-                    else:
-                        fitness_scores[idx] -= TURN_AWAY_PENALTY
-
-
-                car.update(dt)
-                # collision sampling
-                cols = {}
-                for name, xp, yp in car.collision_detector.get_listener_positions():
-                    xp = max(0, min(xp, sx-1))
-                    yp = max(0, min(yp, sy-1))
-                    cols[name] = track_surf.get_at((xp, yp))
-                car.collision_detector.update_colors(cols)
-                if car.collision_detector.check_wall_collision(cols):
-                    car.handle_collision()
-                    fitness_scores[idx] -= crash_penalty
-                    crashed[idx] = True
-                    continue
-                elif car.collision_detector.any_wheel_offtrack(cols):
-                    car.Crr = car.Crr_sand
+    # fixed physics timestep, so fitness and lap times repeat run to run
+    dt = 1.0 / fps
+
+    evaluator = None
+    if headless and workers > 1:
+        evaluator = ParallelEvaluator(track, config, generation_time, dt, workers)
+
+    try:
+        while max_generations is None or generation < max_generations:
+            generation += 1
+            print(f"Generation {generation}")
+
+            # pull genomes out of pop.population (dict of {id:genome})
+            genome_list = list(pop.population.values())
+
+            if evaluator is not None:
+                # sets genome.fitness from the worker processes
+                evaluator.evaluate(genome_list)
+            else:
+                # in the window a field of idle cars isn't worth watching, so
+                # end the generation early like before; headless runs keep
+                # the default so serial and parallel fitness match
+                sim = GenerationSim(track, genome_list, config,
+                                    profiler=viewer.profiler if viewer else None,
+                                    stop_when_idle=not headless)
+                if headless:
+                    sim.run(generation_time, dt)
                 else:
-                    car.Crr = car.Crr_normal
-                mgr.update(car)
-
-                # compute fitness
-
-                # 1) proximity reward
-                new_dist, _ = mgr.get_next_checkpoint_info(car)
-                delta = prev_dists[idx] - new_dist
-                fitness_scores[idx] += delta * proximity_scale
-                prev_dists[idx] = new_dist
-
-                # 2) idle penalty
-                if abs(car.velocity) < max_idle_speed:
-                    fitness_scores[idx] -= idle_penalty_rate * dt
-
-                # 3) lap bonus
-                if mgr.lap_count >= 1:
-                    fitness_scores[idx] += lap_bonus
-
-                # 4) crash penalty (if it jumped over from earlier)
-                if car.collision_detector.check_wall_collision(cols):
-                    fitness_scores[idx] -= crash_penalty
-
-
-                # 5) heading‐alignment bonus
-
-                # get unit heading vector
-                heading_vec = np.array([math.cos(car.yaw), math.sin(car.yaw)])
-                # get vector along the track between current and next CP
-                cp_idx = mgr.current_cp_idx
-                cp1, cp2 = track.checkpoint_lines[cp_idx]
-                p1 = np.array([cp1[0]*bs + bs/2, cp1[1]*bs + bs/2])
-                p2 = np.array([cp2[0]*bs + bs/2, cp2[1]*bs + bs/2])
-                tangent = (p2 - p1)
-                tangent = tangent / np.linalg.norm(tangent)
-                dot = float(np.dot(heading_vec, tangent))
-                fitness_scores[idx] += max(dot, 0) * HEADING_SCALE
-
-                # 6) forward‐speed bonus
-                fitness_scores[idx] += max(car.velocity, 0) * SPEED_SCALE
-
-                # 7) wall‐proximity penalty via LIDAR
-                dists = car.get_lidar(
-                    track_surf, num_rays=7,
-                    fov=math.pi*0.75,
-                    max_dist=car.width*10, step=4
-                )
-                min_d = min(dists)
-                if min_d < WALL_THRESH:
-                    fitness_scores[idx] -= (WALL_THRESH - min_d) * WALL_SCALE
-
-                # 8) small bonus the moment you cross a checkpoint
-                if mgr.current_cp_idx > last_cp_idxs[idx]:
-                    fitness_scores[idx] += CHECKPOINT_BONUS
-                    last_cp_idxs[idx] = mgr.current_cp_idx
-                
-                # 9) steering penalty
-                fitness_scores[idx] -= abs(steer) * STEER_PENALTY * dt
-                fitness_scores[idx] += (1.0 - abs(steer)) * STRAIGHT_BONUS * dt
-
-                # update last_positions if you need them elsewhere
-                last_positions[idx] = (car.x, car.y)
-
-            # — generation idle check —
-            if all(abs(car.velocity) < max_idle_speed for car in cars):
-                print(">> All cars idle—ending generation early")
-                break
-                
-            # draw everything
-            screen.blit(track_surf, (0,0))
-            fov      = math.pi * 1
-            num_rays = 11
-            max_dist = car.width * 10
-            # draw numbered cars
-            for idx, car in enumerate(cars, start=1):
-                # render the genome index in red, just above the car
-                num_surf = font.render(str(idx), True, (255, 0, 0))
-                # position it centered on the car’s top
-                x, y = car.x, car.y
-                label_rect = num_surf.get_rect(center=(x, y - car.height/2 - 10))
-                screen.blit(num_surf, label_rect)
-
-                # now draw the car itself
-                car.draw(screen)
-                # draw the LIDAR rays
-                rays = car.get_lidar(
-                    track_surf,
-                    num_rays=num_rays,
-                    fov=fov,
-                    max_dist=max_dist
-                )
-
-                """
-                # draw each ray in green
-                for i, r in enumerate(rays):
-                    # angle of this ray
-                    ang = car.yaw + (-fov/2 + fov * i/(num_rays-1))
-                    # ray end point
-                    end_x = car.x + r * max_dist * math.cos(ang)
-                    end_y = car.y + r * max_dist * math.sin(ang)
-                    pygame.draw.line(
-                        screen,
-                        (0,255,0),
-                        (car.x, car.y),
-                        (end_x, end_y),
-                        1
-                    )
-                """
-
-            # HUD: gen + timer
-            elapsed = (pygame.time.get_ticks() - start_ticks)/10000.0
-            txt = font.render(
-                f"Gen {generation}  Time {elapsed:.1f}/{generation_time}s", True, (0,0,0)
-            )
-            screen.blit(txt, (10,10))
-
-            save_txt = font.render(
-                f"S to save", True, (0,0,0)
-            )
-            screen.blit(save_txt, (10,30))
-
-            load_txt = font.render(
-                f"L to load", True, (0,0,0)
+                    load_requested = False
+                    # run one generation; the budget is simulated time, the
+                    # window decides how many steps go by per drawn frame
+                    prof = viewer.profiler
+                    while sim.elapsed < generation_time:
+                        prof.begin_frame()
+                        if viewer.paced:
+                            clock.tick(fps)
+                        prof.lap('wait')
+                        loaded = viewer.handle_events(pop)
+                        prof.lap('events')
+                        if loaded is not None:
+                            pop = loaded
+                            load_requested = True
+                            break
+
+                        if not viewer.advance(sim, dt, generation_time):
+                            print(">> All cars retired or idle—ending generation early")
+                            break
+
+                        viewer.draw(sim, generation, sim.elapsed, generation_time)
+                        prof.end_frame()
+
+                    if load_requested:
+                        print(">> Restarting generation with loaded population")
+                        continue   # jump back to top of generation loop
+
+                # assign fitness back onto each genome
+                sim.assign_fitness()
+
+            # now tell NEAT to produce the next generation
+            new_pop = pop.reproduction.reproduce(
+                config, pop.species, pop_size, generation
             )
-            screen.blit(load_txt, (10,50))
-
-            pygame.display.flip()
-        
-        if load_requested:
-            load_requested = False
-            print(">> Restarting generation with loaded population")
-            continue   # jump back to top of generation loop
-
-        # assign fitness back onto each genome
-        for i, (genome, mgr) in enumerate(zip(genome_list, managers)):
-            # combine shaped reward with any lap bonus already counted
-            genome.fitness = fitness_scores[i]
-            print(f"Genome {i} fitness: {genome.fitness:.1f}")
-
-        # now tell NEAT to produce the next generation
-        new_pop = pop.reproduction.reproduce(
-            config, pop.species, pop_size, generation
-        )
-        pop.population = new_pop
-        pop.species.speciate(config, pop.population, generation)
-        pop.generation += 1
-
-
-
+            pop.population = new_pop
+            pop.species.speciate(config, pop.population, generation)
+            pop.generation += 1
+    finally:
+        if evaluator is not None:
+            evaluator.close()
 
 
 if __name__ == "__main__":
+    # pass --headless to train without opening a window,
+    # and --workers N to spread headless generations over N processes
+    headless = '--headless' in sys.argv
+    workers = 1
+    if '--workers' in sys.argv:
+        workers = int(sys.argv[sys.argv.index('--workers') + 1])
     track_name = input("Enter track name (default: 'test'): ")
     if not track_name.strip():
         track_name = "test"
-    main_visual_ga(track_name, pop_size=50, generation_time=10, fps=60)
+    main_visual_ga(track_name, pop_size=50, generation_time=10, fps=60,
+                   headless=headless, workers=workers)
@@ -0,0 +1,283 @@
+"""
+Track walls as line segments.
+
+TrackPieces.png paints walls as dashed, pixel-wide red lines, so the pixel
+sensors see gaps in them and only measure whole pixels. Here each tile's
+walls are written down once as polylines in the sheet's 16×16 tile pixels,
+along the wall's road-facing edge with the gaps closed, and then scaled and
+rotated for every placed block the way compile_terrain places the tile.
+The edges between placed blocks and empty (grass) cells or the map edge
+become segments too, as LIDAR stops on grass; only the tile walls stop a
+car.
+
+Segments are indexed in a uniform grid with one cell per block. A ray
+walks the cells it crosses and intersects just their few segments, so a
+reading is exact to floating point and costs a handful of cells however
+long the ray is.
+"""
+import numpy as np
+
+TILE_SIZE = 16   # tile pixels in TrackPieces.png
+
+
+def _arc(cx, cy, r, deg0, deg1, n=8):
+    """`n`-segment polyline along a circle, from angle deg0 to deg1."""
+    angles = np.radians(np.linspace(deg0, deg1, n + 1))
+    return list(zip(cx + r * np.cos(angles), cy + r * np.sin(angles)))
+
+
+# wall polylines per tile index, in tile pixels, +y down like the sheet
+TILE_WALLS = [
+    [],                                                   # 0 road
+    [[(0, 1), (16, 1)]],                                  # 1 straight, wall on top
+    [_arc(0, 16, 15, -90, 0)],                            # 2 corner, outside wall
+    [[(0, 1), (15, 1), (15, 16)]],                        # 3 corner, square walls
+    [[(1, 0), (1, 16)], [(15, 0), (15, 16)]],             # 4 straight, walled both sides
+    [[(16, 2), (14, 2), (12, 6), (9, 9), (9, 11),         # 5 corner, inside wall
+      (7, 12), (4, 14), (3, 15), (0, 15)]],
+    [], [], [],                                           # 6 sand, 7 gravel, 8 curb
+]
+
+
+def _rotate(u, v, k):
+    """
+    Tile pixel coords after k quarter turns, matching np.rot90(tile, k)
+    on the [y, x] tile map (and pygame.transform.rotate by 90 k degrees).
+    """
+    for _ in range(k % 4):
+        u, v = v, TILE_SIZE - u
+    return u, v
+
+
+class WallGeometry:
+    """
+    Segments (start, delta) with is_wall telling walls from grass edges,
+    each owned by the block cell it lies in (a grass edge by the placed
+    cell it borders). See from_track.
+    """
+    def __init__(self, grid_size, block_size, segments, is_wall, owners, placed):
+        self.grid_size  = grid_size
+        self.block_size = block_size
+        seg = np.asarray(segments, dtype=np.float64).reshape(-1, 4)
+        self.start   = seg[:, :2]
+        self.delta   = seg[:, 2:] - seg[:, :2]
+        self.is_wall = np.asarray(is_wall, dtype=bool)
+        self.placed  = placed                  # [y, x] cells with a block
+
+        # per cell, the segments a ray in it can hit (the ones it owns) and
+        # those a moving car can touch (walls in it and its eight
+        # neighbours); see _pack
+        self.owned = self._pack(grid_size, [[cell] for cell in owners])
+        self.near_walls = self._pack(grid_size, [
+            [(cx + dx, cy + dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)] if wall else []
+            for wall, (cx, cy) in zip(is_wall, owners)])
+
+    def _pack(self, grid_size, cells_of):
+        """
+        Segment i listed under each cell in cells_of[i], packed cell by
+        cell: ((start, delta) rows, count per cell, first row per cell),
+        cells numbered y * grid_size + x.
+        """
+        lists = [[] for _ in range(grid_size * grid_size)]
+        for i, cells in enumerate(cells_of):
+            for cx, cy in cells:
+                if 0 <= cx < grid_size and 0 <= cy < grid_size:
+                    lists[cy * grid_size + cx].append(i)
+        ids   = np.array([i for l in lists for i in l], dtype=np.intp)
+        count = np.array([len(l) for l in lists], dtype=np.intp)
+        rows  = np.concatenate([self.start, self.delta], axis=1)[ids]
+        return rows, count, np.cumsum(count) - count
+
+    @staticmethod
+    def _pairs(table, cells):
+        """
+        Every (query, segment listed under the query's cell) pair from a
+        _pack table: the query of each pair, its segment's start / delta
+        columns, and each query's first pair and number of pairs.
+        """
+        rows, count, first = table
+        n = count[cells]
+        query  = np.repeat(np.arange(len(cells)), n)
+        starts = np.cumsum(n) - n
+        seg = rows[first[cells][query] + np.arange(len(query)) - starts[query]]
+        return query, seg.T, starts, n
+
+    @staticmethod
+    def _nearest(t, starts, n):
+        """Per query, the smallest t over its pairs (inf if it has none)."""
+        nearest = np.full(len(n), np.inf)
+        some = n > 0
+        if len(t):
+            nearest[some] = np.minimum.reduceat(t, starts[some])
+        return nearest
+
+    @classmethod
+    def from_track(cls, track):
+        """The walls and grass edges of a loaded Track."""
+        grid, bs = track.grid_size, track.block_size
+        scale = bs / TILE_SIZE
+        placed = np.zeros((grid, grid), dtype=bool)
+        segments, is_wall, owners = [], [], []
+        for x, y, idx, rot in track.blocks:
+            if not (0 <= x < grid and 0 <= y < grid):
+                continue
+            placed[y, x] = True
+            for line in TILE_WALLS[idx] if 0 <= idx < len(TILE_WALLS) else ():
+                pts = [_rotate(u, v, rot // 90) for u, v in line]
+                for (u0, v0), (u1, v1) in zip(pts, pts[1:]):
+                    segments.append((x*bs + u0*scale, y*bs + v0*scale,
+                                     x*bs + u1*scale, y*bs + v1*scale))
+                    is_wall.append(True)
+                    owners.append((x, y))
+
+        # grass edges: the sides of placed cells that face no block
+        for y, x in zip(*(a.tolist() for a in np.nonzero(placed))):
+            x0, y0, x1, y1 = x*bs, y*bs, (x+1)*bs, (y+1)*bs
+            for nx, ny, side in ((x, y-1, (x0, y0, x1, y0)), (x, y+1, (x0, y1, x1, y1)),
+                                 (x-1, y, (x0, y0, x0, y1)), (x+1, y, (x1, y0, x1, y1))):
+                if not (0 <= nx < grid and 0 <= ny < grid and placed[ny, nx]):
+                    segments.append(side)
+                    is_wall.append(False)
+                    owners.append((x, y))
+        return cls(grid, bs, segments, is_wall, owners, placed)
+
+    def cast(self, xs, ys, yaws, offsets, max_dist=100.0):
+        """
+        trace_rays against the segments: rays at `offsets` from each car's
+        yaw, from (xs, ys), up to `max_dist`. Returns an (N, len(offsets))
+        array in [0..1]; a car on grass reads 0 everywhere.
+        """
+        xs   = np.asarray(xs,   dtype=np.float64)
+        ys   = np.asarray(ys,   dtype=np.float64)
+        yaws = np.asarray(yaws, dtype=np.float64)
+        num_rays = len(offsets)
+        angles = (yaws[:, None] + offsets).ravel()
+        ox, oy = np.repeat(xs, num_rays), np.repeat(ys, num_rays)
+        dx, dy = np.cos(angles), np.sin(angles)
+        grid, bs = self.grid_size, self.block_size
+
+        dist = np.full(len(angles), float(max_dist))
+        cx = np.floor(ox / bs).astype(np.intp)
+        cy = np.floor(oy / bs).astype(np.intp)
+        on_grid = (cx >= 0) & (cx < grid) & (cy >= 0) & (cy < grid)
+        on_grid[on_grid] = self.placed[cy[on_grid], cx[on_grid]]
+        dist[~on_grid] = 0.0
+
+        # cell walk (Amanatides & Woo): ray length to the next x / y cell side
+        step_x = np.where(dx > 0, 1, -1)
+        step_y = np.where(dy > 0, 1, -1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            next_x = np.where(dx != 0, ((cx + (step_x > 0)) * bs - ox) / dx, np.inf)
+            next_y = np.where(dy != 0, ((cy + (step_y > 0)) * bs - oy) / dy, np.inf)
+            delta_x = np.where(dx != 0, bs / np.abs(dx), np.inf)
+            delta_y = np.where(dy != 0, bs / np.abs(dy), np.inf)
+
+        active = np.flatnonzero(on_grid)
+        while len(active):
+            t = self._ray_hits(ox[active], oy[active], dx[active], dy[active],
+                               cy[active] * grid + cx[active])
+            hit = np.isfinite(t)
+            dist[active[hit]] = np.minimum(t[hit], max_dist)
+
+            # on to the next cell, unless out of reach, off the map or on grass
+            a = active[~hit]
+            along_x = next_x[a] < next_y[a]
+            exit_t = np.where(along_x, next_x[a], next_y[a])
+            cx[a] += np.where(along_x, step_x[a], 0)
+            cy[a] += np.where(along_x, 0, step_y[a])
+            next_x[a] += np.where(along_x, delta_x[a], 0)
+            next_y[a] += np.where(along_x, 0, delta_y[a])
+
+            go = exit_t < max_dist
+            inside = (cx[a] >= 0) & (cx[a] < grid) & (cy[a] >= 0) & (cy[a] < grid)
+            go &= inside
+            go[go] = self.placed[cy[a[go]], cx[a[go]]]
+            stopped = (exit_t < max_dist) & ~go     # grass edges should catch these first
+            dist[a[stopped]] = exit_t[stopped]
+            active = a[go]
+
+        return (dist / max_dist).reshape(len(xs), num_rays)
+
+    def _ray_hits(self, ox, oy, dx, dy, cells):
+        """
+        Nearest t ≥ 0 along each ray to a segment its cell (numbered as in
+        _pack) owns, or inf if there's none.
+        """
+        ray, (ax, ay, ex, ey), starts, n = self._pairs(self.owned, cells)
+        wx, wy = ax - ox[ray], ay - oy[ray]
+        dx, dy = dx[ray], dy[ray]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            denom = dx * ey - dy * ex
+            t = (wx * ey - wy * ex) / denom
+            s = (wx * dy - wy * dx) / denom
+            # parallel segments come out inf / NaN and fail these
+            t[~((t >= 0) & (s >= 0) & (s <= 1))] = np.inf
+        return self._nearest(t, starts, n)
+
+    def sweep(self, x0, y0, x1, y1, radius):
+        """
+        For circles of `radius` moving from (x0, y0) to (x1, y1), the
+        fraction of the move at which each first touches a wall, or inf if
+        it doesn't. A circle that already overlaps a wall only counts if it
+        moves further in, so a car can always back away. The move plus the
+        radius must stay within one block.
+        """
+        x0, y0 = np.asarray(x0, dtype=np.float64), np.asarray(y0, dtype=np.float64)
+        mx, my = np.asarray(x1) - x0, np.asarray(y1) - y0
+        grid, bs = self.grid_size, self.block_size
+        cx = np.clip(np.floor(x0 / bs).astype(np.intp), 0, grid - 1)
+        cy = np.clip(np.floor(y0 / bs).astype(np.intp), 0, grid - 1)
+        circle, (ax, ay, ex, ey), starts, n = self._pairs(self.near_walls, cy * grid + cx)
+
+        mx, my = mx[circle], my[circle]
+        px, py = x0[circle] - ax, y0[circle] - ay
+        length = np.hypot(ex, ey)
+        r2 = radius * radius
+        t_hit = np.full(len(circle), np.inf)
+
+        # already touching: only if the move takes it closer
+        s0 = np.clip((px * ex + py * ey) / (length * length), 0.0, 1.0)
+        qx, qy = px - s0 * ex, py - s0 * ey                 # closest point → centre
+        touching = (qx * qx + qy * qy < r2) & (qx * mx + qy * my < 0)
+        t_hit[touching] = 0.0
+
+        # the segment's side, pushed out by the radius toward the circle
+        nx, ny = -ey / length, ex / length
+        side = px * nx + py * ny
+        sign = np.where(side < 0, -1.0, 1.0)
+        gap  = side * sign - radius
+        approach = -(mx * nx + my * ny) * sign              # speed toward the line
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = gap / approach
+            hx, hy = px + t * mx, py + t * my
+            s = (hx * ex + hy * ey) / (length * length)
+        face = (gap >= 0) & (approach > 0) & (t <= 1) & (s >= 0) & (s <= 1)
+        t_hit = np.where(face, np.minimum(t_hit, t), t_hit)
+
+        # the segment's end points
+        a = mx * mx + my * my
+        for ux, uy in ((px, py), (px - ex, py - ey)):
+            b = ux * mx + uy * my
+            c = ux * ux + uy * uy - r2
+            disc = b * b - a * c
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t = (-b - np.sqrt(np.maximum(disc, 0.0))) / a
+            end = (a > 0) & (disc >= 0) & (c >= 0) & (t >= 0) & (t <= 1)
+            t_hit = np.where(end, np.minimum(t_hit, t), t_hit)
+
+        return self._nearest(t_hit, starts, n)
+
+    def sweep_cars(self, x0, y0, yaw0, x1, y1, yaw1, length, width):
+        """
+        sweep() for cars as capsules: a circle of width / 2 over each axle
+        end of a `length` × `width` body, moved from pose 0 to pose 1.
+        Returns the fraction of the move at which each car first touches a
+        wall (inf if it doesn't).
+        """
+        x0, y0, yaw0 = (np.asarray(a, dtype=np.float64) for a in (x0, y0, yaw0))
+        x1, y1, yaw1 = (np.asarray(a, dtype=np.float64) for a in (x1, y1, yaw1))
+        reach = np.array([[(length - width) / 2], [(width - length) / 2]])
+        t = self.sweep((x0 + reach * np.cos(yaw0)).ravel(), (y0 + reach * np.sin(yaw0)).ravel(),
+                       (x1 + reach * np.cos(yaw1)).ravel(), (y1 + reach * np.sin(yaw1)).ravel(),
+                       width / 2)
+        return t.reshape(2, -1).min(axis=0)